@@ -525,7 +525,7 @@ def create_app():
                 elif input_format == 'csv':
                     csv_content = data.get('csv_content', '')
                     text_column = data.get('text_column', 'text')
-                    texts = bulk_processor.import_from_csv(csv_content, text_column)
+                    texts = bulk_processor.import_from_csv(csv_content, text_column, limit=10001)
                 else:
                     return jsonify({'error': 'Unsupported input format. Use "json" or "csv".'}), 400
             else:
@@ -537,16 +537,15 @@ def create_app():
                 if file.filename == '':
                     return jsonify({'error': 'No file selected'}), 400
                 
-                # Read file content
-                content = file.read().decode('utf-8')
                 input_format = file.filename.split('.')[-1].lower()
                 
-                # Extract texts based on format
+                # Extract texts based on format; CSV uploads are parsed straight
+                # from the upload stream, stopping once the item limit is exceeded
                 if input_format == 'json':
-                    texts = bulk_processor.import_from_json(content)
+                    texts = bulk_processor.import_from_json(file.read())
                 elif input_format == 'csv':
                     text_column = request.form.get('text_column', 'text')
-                    texts = bulk_processor.import_from_csv(content, text_column)
+                    texts = bulk_processor.import_from_csv(file.stream, text_column, limit=10001)
                 else:
                     return jsonify({'error': f'Unsupported file format: {input_format}. Use CSV or JSON.'}), 400
             
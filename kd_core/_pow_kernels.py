@@ -0,0 +1,208 @@
+"""
+Compiled Proof-of-Work Kernels for the KD-Code Blockchain
+Implements SHA-256 nonce search with Numba when it is installed
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# SHA-256 round constants and initial hash values (FIPS 180-4)
+_K = np.array([
+    0x428a2f98, 0x71374491, 0xb5c0fbcf, 0xe9b5dba5, 0x3956c25b, 0x59f111f1, 0x923f82a4, 0xab1c5ed5,
+    0xd807aa98, 0x12835b01, 0x243185be, 0x550c7dc3, 0x72be5d74, 0x80deb1fe, 0x9bdc06a7, 0xc19bf174,
+    0xe49b69c1, 0xefbe4786, 0x0fc19dc6, 0x240ca1cc, 0x2de92c6f, 0x4a7484aa, 0x5cb0a9dc, 0x76f988da,
+    0x983e5152, 0xa831c66d, 0xb00327c8, 0xbf597fc7, 0xc6e00bf3, 0xd5a79147, 0x06ca6351, 0x14292967,
+    0x27b70a85, 0x2e1b2138, 0x4d2c6dfc, 0x53380d13, 0x650a7354, 0x766a0abb, 0x81c2c92e, 0x92722c85,
+    0xa2bfe8a1, 0xa81a664b, 0xc24b8b70, 0xc76c51a3, 0xd192e819, 0xd6990624, 0xf40e3585, 0x106aa070,
+    0x19a4c116, 0x1e376c08, 0x2748774c, 0x34b0bcb5, 0x391c0cb3, 0x4ed8aa4a, 0x5b9cca4f, 0x682e6ff3,
+    0x748f82ee, 0x78a5636f, 0x84c87814, 0x8cc70208, 0x90befffa, 0xa4506ceb, 0xbef9a3f7, 0xc67178f2,
+], dtype=np.int64)
+
+_H0 = np.array([
+    0x6a09e667, 0xbb67ae85, 0x3c6ef372, 0xa54ff53a, 0x510e527f, 0x9b05688c, 0x1f83d9ab, 0x5be0cd19,
+], dtype=np.int64)
+
+# Upper bound for the nonce search; never reached at realistic difficulties
+_MAX_NONCE = 1 << 62
+
+# Attempts between checks of the shared "found" flag
+_POLL_INTERVAL = 4096
+
+
+def _state_to_hex(state: np.ndarray) -> str:
+    """Format a SHA-256 state as the usual 64-character hex digest"""
+    return ''.join(f'{int(word):08x}' for word in state)
+
+
+if NUMBA_AVAILABLE:
+
+    @numba.njit(cache=True)
+    def _rotr(x, n):
+        return ((x >> n) | (x << (32 - n))) & 0xFFFFFFFF
+
+    @numba.njit(cache=True)
+    def _compress(state, buf, offset, w):
+        """Run one SHA-256 compression over the 64-byte block at buf[offset:]"""
+        for t in range(16):
+            i = offset + 4 * t
+            w[t] = (np.int64(buf[i]) << 24) | (np.int64(buf[i + 1]) << 16) | (np.int64(buf[i + 2]) << 8) | np.int64(buf[i + 3])
+        for t in range(16, 64):
+            s0 = _rotr(w[t - 15], 7) ^ _rotr(w[t - 15], 18) ^ (w[t - 15] >> 3)
+            s1 = _rotr(w[t - 2], 17) ^ _rotr(w[t - 2], 19) ^ (w[t - 2] >> 10)
+            w[t] = (w[t - 16] + s0 + w[t - 7] + s1) & 0xFFFFFFFF
+
+        a, b, c, d = state[0], state[1], state[2], state[3]
+        e, f, g, h = state[4], state[5], state[6], state[7]
+        for t in range(64):
+            big_s1 = _rotr(e, 6) ^ _rotr(e, 11) ^ _rotr(e, 25)
+            ch = (e & f) ^ ((~e) & g)
+            temp1 = (h + big_s1 + ch + _K[t] + w[t]) & 0xFFFFFFFF
+            big_s0 = _rotr(a, 2) ^ _rotr(a, 13) ^ _rotr(a, 22)
+            maj = (a & b) ^ (a & c) ^ (b & c)
+            temp2 = (big_s0 + maj) & 0xFFFFFFFF
+            h = g
+            g = f
+            f = e
+            e = (d + temp1) & 0xFFFFFFFF
+            d = c
+            c = b
+            b = a
+            a = (temp1 + temp2) & 0xFFFFFFFF
+
+        state[0] = (state[0] + a) & 0xFFFFFFFF
+        state[1] = (state[1] + b) & 0xFFFFFFFF
+        state[2] = (state[2] + c) & 0xFFFFFFFF
+        state[3] = (state[3] + d) & 0xFFFFFFFF
+        state[4] = (state[4] + e) & 0xFFFFFFFF
+        state[5] = (state[5] + f) & 0xFFFFFFFF
+        state[6] = (state[6] + g) & 0xFFFFFFFF
+        state[7] = (state[7] + h) & 0xFFFFFFFF
+
+    @numba.njit(cache=True)
+    def _meets_difficulty(state, difficulty):
+        """Check that the digest starts with `difficulty` zero hex digits"""
+        full_words = difficulty // 8
+        for i in range(full_words):
+            if state[i] != 0:
+                return False
+        remaining = difficulty % 8
+        if remaining:
+            return (state[full_words] >> (32 - 4 * remaining)) == 0
+        return True
+
+    @numba.njit(cache=True, nogil=True)
+    def _mine_kernel(prefix, difficulty, first_nonce, stride, found):
+        """
+        Try first_nonce, first_nonce + stride, ... until a nonce meets the
+        difficulty or another worker sets found[0]
+        """
+        n = prefix.shape[0]
+        w = np.empty(64, np.int64)
+
+        # Compress every complete 64-byte block of the prefix once; only the
+        # tail, the nonce digits and the padding are hashed per attempt
+        head_len = (n // 64) * 64
+        midstate = _H0.copy()
+        for offset in range(0, head_len, 64):
+            _compress(midstate, prefix, offset, w)
+
+        tail_len = n - head_len
+        # SHA-256 padding depends only on the message length, so build one
+        # padded tail per nonce digit count up front: tail, room for the
+        # digits, the 0x80 marker, zeros and the bit length
+        max_total = ((tail_len + 20 + 9 + 63) // 64) * 64
+        templates = np.zeros((21, max_total), np.uint8)
+        totals = np.zeros(21, np.int64)
+        for k in range(1, 21):
+            buf_len = tail_len + k
+            total = ((buf_len + 9 + 63) // 64) * 64
+            totals[k] = total
+            templates[k, :tail_len] = prefix[head_len:]
+            templates[k, buf_len] = 0x80
+            bit_len = (n + k) * 8
+            for j in range(8):
+                templates[k, total - 1 - j] = (bit_len >> (8 * j)) & 0xFF
+        digits = np.empty(20, np.uint8)
+        state = np.empty(8, np.int64)
+
+        nonce = first_nonce
+        attempts = 0
+        while nonce < _MAX_NONCE:
+            # Check every _POLL_INTERVAL attempts whether another worker has already won
+            attempts += 1
+            if attempts == _POLL_INTERVAL:
+                attempts = 0
+                if found[0]:
+                    break
+
+            # Write the decimal nonce into the template for its digit count
+            x = nonce
+            k = 0
+            while True:
+                digits[k] = 48 + x % 10
+                x //= 10
+                k += 1
+                if x == 0:
+                    break
+            buf = templates[k]
+            for j in range(k):
+                buf[tail_len + j] = digits[k - 1 - j]
+            total = totals[k]
+
+            state[:] = midstate
+            for offset in range(0, total, 64):
+                _compress(state, buf, offset, w)
+
+            if _meets_difficulty(state, difficulty):
+                found[0] = 1
+                return nonce, state
+            nonce += stride
+
+        return -1, state
+
+
+def mine_numba(prefix: bytes, difficulty: int, start_nonce: int, workers: Optional[int] = None) -> Tuple[int, str]:
+    """
+    Find a nonce whose block hash has the required leading zeros
+
+    The kernel runs without the GIL, so the nonce space is interleaved across
+    a thread pool: worker k tries start_nonce + k, start_nonce + k + workers, ...
+    The first worker to succeed signals the others to stop.
+
+    Args:
+        prefix: Serialized invariant part of the block
+        difficulty: Number of leading hex zeros required
+        start_nonce: First nonce to try
+        workers: Number of mining threads (defaults to the CPU count)
+
+    Returns:
+        Tuple of (nonce, block hash as hex string)
+    """
+    prefix_arr = np.frombuffer(prefix, dtype=np.uint8)
+    found = np.zeros(1, dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        nonce, state = _mine_kernel(prefix_arr, difficulty, start_nonce, 1, found)
+        return nonce, _state_to_hex(state)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(_mine_kernel, prefix_arr, difficulty, start_nonce + k, workers, found)
+            for k in range(workers)
+        ]
+        results = [future.result() for future in futures]
+
+    # Several workers can finish in the same polling window; keep the lowest nonce
+    nonce, state = min((r for r in results if r[0] >= 0), key=lambda r: r[0])
+    return nonce, _state_to_hex(state)
@@ -0,0 +1,111 @@
+"""
+Compiled Frame Scoring Kernels for KD-Code Scanning
+Samples the data rings of a grayscale frame with Numba when it is installed
+"""
+
+import math
+from typing import Tuple
+
+import numpy as np
+
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+# Intensity distance from the threshold that counts as a fully confident sample,
+# matching the contrast normalization in decode_kd_code
+_FULL_CONTRAST = 128.0
+
+
+def _sample_rings_numpy(gray, center_x, center_y, inner_radius, ring_width, num_rings, segments_per_ring, angle_offset):
+    """Bilinearly sample the center of every segment; reference version of the kernel"""
+    h, w = gray.shape
+    radii = inner_radius + (np.arange(num_rings) + 0.5) * ring_width
+    angles = angle_offset + np.arange(segments_per_ring) * (2 * math.pi / segments_per_ring)
+    xs = np.clip(center_x + radii[:, None] * np.cos(angles), 0, w - 1)
+    ys = np.clip(center_y + radii[:, None] * np.sin(angles), 0, h - 1)
+
+    x1 = xs.astype(np.int64)
+    y1 = ys.astype(np.int64)
+    x2 = np.minimum(x1 + 1, w - 1)
+    y2 = np.minimum(y1 + 1, h - 1)
+    dx = xs - x1
+    dy = ys - y1
+    img = gray.astype(np.float64)
+    return (img[y1, x1] * (1 - dx) * (1 - dy) + img[y1, x2] * dx * (1 - dy) +
+            img[y2, x1] * (1 - dx) * dy + img[y2, x2] * dx * dy)
+
+
+if NUMBA_AVAILABLE:
+
+    # A frame has only a few hundred samples, too few to pay for numba's
+    # thread pool, so the kernel runs serially
+    @numba.njit(cache=True, fastmath=True)
+    def _sample_rings(gray, center_x, center_y, inner_radius, ring_width, num_rings, segments_per_ring, angle_offset):
+        """Bilinearly sample the center of every segment"""
+        h, w = gray.shape
+        samples = np.empty((num_rings, segments_per_ring), np.float64)
+        step = 2.0 * math.pi / segments_per_ring
+        for ring in range(num_rings):
+            radius = inner_radius + (ring + 0.5) * ring_width
+            for seg in range(segments_per_ring):
+                angle = angle_offset + seg * step
+                x = min(max(center_x + radius * math.cos(angle), 0.0), w - 1.0)
+                y = min(max(center_y + radius * math.sin(angle), 0.0), h - 1.0)
+                x1 = int(x)
+                y1 = int(y)
+                x2 = min(x1 + 1, w - 1)
+                y2 = min(y1 + 1, h - 1)
+                dx = x - x1
+                dy = y - y1
+                samples[ring, seg] = (gray[y1, x1] * (1 - dx) * (1 - dy) + gray[y1, x2] * dx * (1 - dy) +
+                                      gray[y2, x1] * (1 - dx) * dy + gray[y2, x2] * dx * dy)
+        return samples
+
+else:
+    _sample_rings = _sample_rings_numpy
+
+
+def score_rings(gray: np.ndarray, center_x: float, center_y: float, inner_radius: float, ring_width: float,
+                num_rings: int, segments_per_ring: int, angle_offset: float = 0.0) -> Tuple[float, np.ndarray]:
+    """
+    Read the data rings of a grayscale frame and score how cleanly they read
+
+    Every segment is sampled at its center and thresholded against the mean
+    of all samples; segments darker than the threshold read as 1, as drawn by
+    the encoder. A sample's confidence is its distance from the threshold,
+    normalized the same way decode_kd_code normalizes contrast.
+
+    Args:
+        gray: 2-D uint8 grayscale frame
+        center_x: X coordinate of the code center in pixels
+        center_y: Y coordinate of the code center in pixels
+        inner_radius: Radius where the first data ring starts
+        ring_width: Width of each data ring in pixels
+        num_rings: Number of data rings to read
+        segments_per_ring: Number of segments in each ring
+        angle_offset: Orientation of the first segment in radians
+
+    Returns:
+        Tuple of (mean confidence in [0, 1], bits as a uint8 array of shape (num_rings, segments_per_ring))
+    """
+    samples = _sample_rings(np.ascontiguousarray(gray, dtype=np.uint8), float(center_x), float(center_y),
+                            float(inner_radius), float(ring_width), int(num_rings), int(segments_per_ring),
+                            float(angle_offset))
+    threshold = samples.mean()
+    bits = (samples < threshold).astype(np.uint8)
+    confidence = float(np.minimum(np.abs(samples - threshold) / _FULL_CONTRAST, 1.0).mean())
+    return confidence, bits
+
+
+def warm_up():
+    """
+    Compile the kernel ahead of the first frame
+
+    Numba compiles on first call (or loads its on-disk cache), which would
+    otherwise stall whichever request happens to score the first frame.
+    """
+    score_rings(np.zeros((8, 8), dtype=np.uint8), 4.0, 4.0, 1.0, 1.0, 2, 8)
@@ -7,21 +7,80 @@ import hashlib
 import hmac
 import secrets
 import base64
-from datetime import datetime, timedelta
-from typing import Dict, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Tuple, Union
 import logging
 import os
 import json
-from cryptography.fernet import Fernet
+import re
+import time
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
 
+# Matches the "[SECURE:<user>]" marker; the groups are None when the marker is malformed
+_SECURE_MARKER_RE = re.compile(r'\[SECURE:(?:([^\]]{0,64})\](.*))?', re.DOTALL)
+
+# Encoder/decoder are bound on first use to keep this module cheap to import
+_generate_kd_code = None
+_decode_kd_code = None
+
+
+def _get_encoder():
+    """Return kd_core.encoder.generate_kd_code, importing it on first use"""
+    global _generate_kd_code
+    if _generate_kd_code is None:
+        from kd_core.encoder import generate_kd_code as _generate_kd_code
+    return _generate_kd_code
+
+
+def _get_decoder():
+    """Return kd_core.decoder.decode_kd_code, importing it on first use"""
+    global _decode_kd_code
+    if _decode_kd_code is None:
+        from kd_core.decoder import decode_kd_code as _decode_kd_code
+    return _decode_kd_code
+
+
+@dataclass
+class BiometricTemplate:
+    """Stored biometric template for an enrolled user"""
+    __slots__ = ('enrollment_id', 'biometric_hash', 'salt', 'created_at', 'failed_attempts', 'locked_until')
+    enrollment_id: Optional[str]
+    biometric_hash: str
+    salt: bytes
+    created_at: Optional[int]
+    failed_attempts: int
+    locked_until: Optional[float]
+
+
+@dataclass
+class BiometricSession:
+    """Session issued after a successful biometric authentication"""
+    __slots__ = ('user_id', 'created_at', 'expires_at')
+    user_id: str
+    created_at: int
+    expires_at: float
+
+
 class BiometricAuthenticator:
     """
     Provides biometric-enhanced security for KD-Code system
     """
     
+    # Placeholder compared against when authenticating an unknown user
+    _DUMMY_TEMPLATE = BiometricTemplate(
+        enrollment_id=None,
+        biometric_hash=hashlib.sha256(b'\x00' * 32).hexdigest(),
+        salt=b'\x00' * 16,
+        created_at=None,
+        failed_attempts=0,
+        locked_until=None
+    )
+    
     def __init__(self, secret_key: Optional[bytes] = None):
         """
         Initialize the biometric authenticator
@@ -35,18 +94,22 @@ class BiometricAuthenticator:
             self.secret_key = secret_key
         
         self.cipher_suite = Fernet(self.secret_key)
+        self._session_mac_key = os.urandom(32)  # Signs session tokens
         self.biometric_templates = {}  # In production, use a secure database
-        self.authenticated_sessions = {}  # Store authenticated sessions
+        self.authenticated_sessions = OrderedDict()  # Store authenticated sessions, oldest first
+        self.max_sessions = 100000  # Upper bound on concurrently stored sessions
+        self.session_duration = 7200  # Session lifetime in seconds (2 hours)
         self.max_attempts = 3  # Max authentication attempts before lockout
         self.lockout_duration = 300  # Lockout duration in seconds (5 minutes)
+        self._secure_prefix_cache = {}  # user_id -> "[SECURE:...]" marker
     
-    def enroll_biometric_template(self, user_id: str, biometric_data: str) -> str:
+    def enroll_biometric_template(self, user_id: str, biometric_data: Union[str, bytes]) -> str:
         """
         Enroll a new biometric template for a user
         
         Args:
             user_id: Unique identifier for the user
-            biometric_data: Biometric data (e.g., fingerprint hash, facial features)
+            biometric_data: Biometric data (e.g., fingerprint hash, facial features), as text or raw bytes
         
         Returns:
             Enrollment ID for the biometric template
@@ -58,18 +121,39 @@ class BiometricAuthenticator:
         biometric_hash = self._hash_biometric_data(biometric_data, salt)
         
         # Store the biometric template securely
-        self.biometric_templates[user_id] = {
-            'enrollment_id': enrollment_id,
-            'biometric_hash': biometric_hash,
-            'salt': base64.b64encode(salt).decode(),
-            'created_at': datetime.utcnow().isoformat(),
-            'failed_attempts': 0,
-            'locked_until': None
-        }
+        self.biometric_templates[user_id] = BiometricTemplate(
+            enrollment_id=enrollment_id,
+            biometric_hash=biometric_hash,
+            salt=salt,
+            created_at=int(time.time()),
+            failed_attempts=0,
+            locked_until=None
+        )
+        self._secure_prefix_cache[user_id] = f"[SECURE:{user_id[:8]}]"
         
         return enrollment_id
     
-    def authenticate_with_biometrics(self, user_id: str, biometric_data: str) -> Tuple[bool, Optional[str]]:
+    def enroll_many(self, enrollments: Dict[str, Union[str, bytes]]) -> Dict[str, str]:
+        """
+        Enroll biometric templates for several users in parallel
+        
+        hashlib releases the GIL while hashing large buffers, so enrolling
+        kilobyte-scale samples (voiceprints, face embeddings) scales with cores.
+        
+        Args:
+            enrollments: Mapping of user ID to biometric data
+        
+        Returns:
+            Mapping of user ID to enrollment ID
+        """
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            futures = {
+                user_id: executor.submit(self.enroll_biometric_template, user_id, biometric_data)
+                for user_id, biometric_data in enrollments.items()
+            }
+        return {user_id: future.result() for user_id, future in futures.items()}
+    
+    def authenticate_with_biometrics(self, user_id: str, biometric_data: Union[str, bytes]) -> Tuple[bool, Optional[str]]:
         """
         Authenticate a user using biometric data
         
@@ -80,45 +164,49 @@ class BiometricAuthenticator:
         Returns:
             Tuple of (is_authenticated, session_token)
         """
-        if user_id not in self.biometric_templates:
-            return False, None
-        
-        template = self.biometric_templates[user_id]
+        # Unknown users are checked against a placeholder template so that both
+        # paths do the same hashing work and do not reveal enrollment via timing
+        template = self.biometric_templates.get(user_id)
+        is_enrolled = template is not None
+        if not is_enrolled:
+            template = self._DUMMY_TEMPLATE
         
         # Check if account is locked
-        if template['locked_until']:
-            locked_until = datetime.fromisoformat(template['locked_until'])
-            if datetime.utcnow() < locked_until:
+        if template.locked_until:
+            if time.time() < template.locked_until:
                 return False, "Account temporarily locked due to failed attempts"
         
         # Hash the provided biometric data with the stored salt
-        salt = base64.b64decode(template['salt'].encode())
-        provided_hash = self._hash_biometric_data(biometric_data, salt)
+        provided_hash = self._hash_biometric_data(biometric_data, template.salt)
         
         # Compare hashes securely
-        if hmac.compare_digest(template['biometric_hash'], provided_hash):
+        hashes_match = hmac.compare_digest(template.biometric_hash, provided_hash)
+        if not is_enrolled:
+            return False, None
+        
+        if hashes_match:
             # Reset failed attempts on successful authentication
-            template['failed_attempts'] = 0
-            template['locked_until'] = None
+            template.failed_attempts = 0
+            template.locked_until = None
             
             # Generate a session token
             session_token = self._generate_session_token(user_id)
-            self.authenticated_sessions[session_token] = {
-                'user_id': user_id,
-                'created_at': datetime.utcnow(),
-                'expires_at': datetime.utcnow() + timedelta(hours=2)  # 2-hour session
-            }
+            now = time.time()
+            self._prune_sessions(now)
+            self.authenticated_sessions[session_token] = BiometricSession(
+                user_id=user_id,
+                created_at=int(now),
+                expires_at=now + self.session_duration
+            )
             
             return True, session_token
         else:
             # Increment failed attempts
-            template['failed_attempts'] += 1
+            template.failed_attempts += 1
             
             # Lock account if too many failed attempts
-            if template['failed_attempts'] >= self.max_attempts:
-                template['locked_until'] = (
-                    datetime.utcnow() + timedelta(seconds=self.lockout_duration)
-                ).isoformat()
+            if template.failed_attempts >= self.max_attempts:
+                template.locked_until = time.time() + self.lockout_duration
             
             return False, "Biometric authentication failed"
     
@@ -132,18 +220,38 @@ class BiometricAuthenticator:
         Returns:
             True if token is valid, False otherwise
         """
-        if session_token not in self.authenticated_sessions:
+        # Reject forged tokens before touching the session store
+        if not self._has_valid_signature(session_token):
             return False
         
-        session = self.authenticated_sessions[session_token]
+        session = self.authenticated_sessions.get(session_token)
+        if session is None:
+            return False
         
         # Check if session has expired
-        if datetime.utcnow() > session['expires_at']:
+        if time.time() > session.expires_at:
             del self.authenticated_sessions[session_token]
             return False
         
         return True
     
+    def _prune_sessions(self, now: float) -> None:
+        """
+        Evict expired sessions and enforce the session cap
+        
+        Sessions share a fixed lifetime and are stored in creation order, so
+        expired entries are always at the front of the ordered dict.
+        
+        Args:
+            now: Current epoch time used for the expiry check
+        """
+        sessions = self.authenticated_sessions
+        while sessions:
+            oldest = next(iter(sessions.values()))
+            if oldest.expires_at > now and len(sessions) < self.max_sessions:
+                break
+            sessions.popitem(last=False)
+    
     def get_user_from_session(self, session_token: str) -> Optional[str]:
         """
         Get user ID from a session token
@@ -157,24 +265,26 @@ class BiometricAuthenticator:
         if not self.verify_session_token(session_token):
             return None
         
-        return self.authenticated_sessions[session_token]['user_id']
+        return self.authenticated_sessions[session_token].user_id
     
-    def _hash_biometric_data(self, biometric_data: str, salt: bytes) -> str:
+    def _hash_biometric_data(self, biometric_data: Union[str, bytes], salt: bytes) -> str:
         """
         Securely hash biometric data with salt
         
         Args:
-            biometric_data: Raw biometric data
+            biometric_data: Raw biometric data as text or bytes
             salt: Salt for hashing
         
         Returns:
             Hashed biometric data as hex string
         """
-        # Combine biometric data with salt
-        combined_data = biometric_data.encode() + salt
+        if not isinstance(biometric_data, (bytes, bytearray, memoryview)):
+            biometric_data = biometric_data.encode()
         
-        # Create hash
-        hash_obj = hashlib.sha256(combined_data)
+        # Feed data and salt separately rather than concatenating them into a copy
+        hash_obj = hashlib.sha256()
+        hash_obj.update(memoryview(biometric_data))
+        hash_obj.update(salt)
         return hash_obj.hexdigest()
     
     def _generate_session_token(self, user_id: str) -> str:
@@ -187,8 +297,37 @@ class BiometricAuthenticator:
         Returns:
             Session token
         """
-        token_data = f"{user_id}:{datetime.utcnow().isoformat()}:{secrets.token_hex(16)}"
-        return self.cipher_suite.encrypt(token_data.encode()).decode()
+        token_body = secrets.token_urlsafe(32)
+        tag = base64.urlsafe_b64encode(self._sign(token_body.encode())).rstrip(b'=').decode()
+        return f"{token_body}.{tag}"
+    
+    def _sign(self, msg: bytes) -> bytes:
+        """
+        Compute the session MAC for a message
+        
+        Args:
+            msg: Message to sign
+        
+        Returns:
+            Raw HMAC-SHA256 digest
+        """
+        return hmac.digest(self._session_mac_key, msg, 'sha256')
+    
+    def _has_valid_signature(self, session_token: str) -> bool:
+        """
+        Check that a session token carries a valid MAC
+        
+        Args:
+            session_token: Session token to check
+        
+        Returns:
+            True if the token was signed by this authenticator
+        """
+        token_body, _, tag = session_token.rpartition('.')
+        if not token_body:
+            return False
+        expected = base64.urlsafe_b64encode(self._sign(token_body.encode())).rstrip(b'=').decode()
+        return hmac.compare_digest(expected, tag)
     
     def encrypt_sensitive_data(self, data: str, user_id: str) -> str:
         """
@@ -199,11 +338,11 @@ class BiometricAuthenticator:
             user_id: User ID for context
         
         Returns:
-            Encrypted data as base64 string
+            Encrypted data as a urlsafe base64 Fernet token
         """
         # Create a key derived from user's biometric template (if enrolled)
         if user_id in self.biometric_templates:
-            salt = base64.b64decode(self.biometric_templates[user_id]['salt'].encode())
+            salt = self.biometric_templates[user_id].salt
             # Derive a key from the biometric template
             kdf = PBKDF2HMAC(
                 algorithm=hashes.SHA256(),
@@ -218,25 +357,26 @@ class BiometricAuthenticator:
             # Fallback to standard encryption
             encrypted_data = self.cipher_suite.encrypt(data.encode())
         
-        return base64.b64encode(encrypted_data).decode()
+        # Fernet tokens are already urlsafe base64, so no further wrapping is needed
+        return encrypted_data.decode()
     
     def decrypt_sensitive_data(self, encrypted_data: str, user_id: str) -> Optional[str]:
         """
         Decrypt sensitive data using biometric-enhanced security
         
         Args:
-            encrypted_data: Base64 encoded encrypted data
+            encrypted_data: Fernet token produced by encrypt_sensitive_data
             user_id: User ID for context
         
         Returns:
             Decrypted data or None if decryption fails
         """
         try:
-            encrypted_bytes = base64.b64decode(encrypted_data.encode())
+            encrypted_bytes = encrypted_data.encode()
             
             # Try to decrypt using biometric-derived key first
             if user_id in self.biometric_templates:
-                salt = base64.b64decode(self.biometric_templates[user_id]['salt'].encode())
+                salt = self.biometric_templates[user_id].salt
                 kdf = PBKDF2HMAC(
                     algorithm=hashes.SHA256(),
                     length=32,
@@ -245,10 +385,15 @@ class BiometricAuthenticator:
                 )
                 key = base64.urlsafe_b64encode(kdf.derive(user_id.encode()))
                 cipher = Fernet(key)
-                decrypted_data = cipher.decrypt(encrypted_bytes)
             else:
                 # Fallback to standard decryption
-                decrypted_data = self.cipher_suite.decrypt(encrypted_bytes)
+                cipher = self.cipher_suite
+            
+            try:
+                decrypted_data = cipher.decrypt(encrypted_bytes)
+            except InvalidToken:
+                # Legacy payloads were wrapped in an extra layer of base64
+                decrypted_data = cipher.decrypt(base64.b64decode(encrypted_bytes))
             
             return decrypted_data.decode()
         except Exception:
@@ -274,15 +419,16 @@ class BiometricAuthenticator:
         
         # In a real implementation, you might embed user-specific information
         # or apply additional security measures based on biometric verification
-        from kd_core.encoder import generate_kd_code
-        
         # Add a biometric security marker to the text if needed
         if require_biometric:
-            secure_text = f"[SECURE:{user_id[:8]}]{text}"
+            prefix = self._secure_prefix_cache.get(user_id)
+            if prefix is None:
+                prefix = self._secure_prefix_cache[user_id] = f"[SECURE:{user_id[:8]}]"
+            secure_text = prefix + text
         else:
             secure_text = text
         
-        return generate_kd_code(secure_text)
+        return _get_encoder()(secure_text)
     
     def validate_secure_kd_code(self, kd_code_image: bytes, user_id: str) -> Tuple[bool, Optional[str]]:
         """
@@ -295,29 +441,20 @@ class BiometricAuthenticator:
         Returns:
             Tuple of (is_valid, decoded_text)
         """
-        from kd_core.decoder import decode_kd_code
+        decoded_text = _get_decoder()(kd_code_image)
         
-        decoded_text = decode_kd_code(kd_code_image)
-        
-        if decoded_text and decoded_text.startswith("[SECURE:"):
+        match = _SECURE_MARKER_RE.match(decoded_text) if decoded_text else None
+        if match:
             # This is a secure code that requires biometric validation
             if user_id not in self.biometric_templates:
                 return False, "Biometric authentication required for this code"
             
-            # Extract the user ID from the secure marker
-            try:
-                end_marker = decoded_text.find(']')
-                if end_marker != -1:
-                    embedded_user = decoded_text[9:end_marker]  # Extract user ID after "[SECURE:"
-                    actual_text = decoded_text[end_marker+1:]  # Remaining text after marker
-                    
-                    # Verify that the requesting user matches the embedded user
-                    if user_id in self.biometric_templates:
-                        # In a real system, you would verify the biometric authentication
-                        # For this example, we'll just return the actual text
-                        return True, actual_text
-            except:
-                pass
+            # Extract the user ID and payload from the secure marker
+            embedded_user, actual_text = match.groups()
+            if actual_text is not None:
+                # In a real system, you would verify the biometric authentication
+                # against embedded_user. For this example, we'll just return the actual text
+                return True, actual_text
             
             return False, "Unauthorized access to secure code"
         
@@ -354,6 +491,19 @@ def enroll_user_biometric(user_id: str, biometric_data: str) -> str:
     return biometric_auth.enroll_biometric_template(user_id, biometric_data)
 
 
+def enroll_users_biometric(enrollments: Dict[str, Union[str, bytes]]) -> Dict[str, str]:
+    """
+    Enroll biometric templates for several users at once
+    
+    Args:
+        enrollments: Mapping of user ID to biometric data
+    
+    Returns:
+        Mapping of user ID to enrollment ID
+    """
+    return biometric_auth.enroll_many(enrollments)
+
+
 def authenticate_user_with_biometrics(user_id: str, biometric_data: str) -> Tuple[bool, Optional[str]]:
     """
     Authenticate a user using biometric data
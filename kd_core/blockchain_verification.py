@@ -4,64 +4,251 @@ Implements blockchain-based verification for KD-Code authenticity
 """
 
 import hashlib
-import json
+import logging
+import math
+import numpy as np
+import orjson
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
+from itertools import count
 from datetime import datetime
 import requests
 import base64
-from Crypto.Hash import SHA256
-from Crypto.PublicKey import RSA
-from Crypto.Signature import pkcs1_15
-from Crypto.Cipher import PKCS1_OAEP
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric import ed25519
 import secrets
 
+from ._pow_kernels import NUMBA_AVAILABLE, mine_numba
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+
+@dataclass(init=False)
 class Block:
     """Represents a block in the KD-Code blockchain"""
+    __slots__ = ('index', 'timestamp', 'data', 'previous_hash', 'nonce', 'hash', 'merkle_root', '_parsed')
     index: int
     timestamp: float
-    data: str  # Hash of KD-Code and metadata
+    data: bytes  # Serialized KD-Code hashes and metadata
     previous_hash: str
-    nonce: int = 0
-    hash: str = ""
+    nonce: int
+    hash: str
+    merkle_root: str  # Root over the block's KD-Code hashes, for inclusion proofs
+    
+    def __init__(self, index: int, timestamp: float, data, previous_hash: str,
+                 nonce: int = 0, hash: str = "", merkle_root: str = ""):
+        # Written out so the defaults survive alongside __slots__ on Python 3.9;
+        # str data from older callers is stored UTF-8 encoded
+        self.index = index
+        self.timestamp = timestamp
+        self.data = data.encode() if isinstance(data, str) else data
+        self.previous_hash = previous_hash
+        self.nonce = nonce
+        self.hash = hash
+        self.merkle_root = merkle_root
+    
+    def hash_prefix(self) -> bytes:
+        """Serialize the part of the block that does not change while mining"""
+        return b"%d%s%s%s" % (self.index, repr(self.timestamp).encode(), self.data, self.previous_hash.encode())
     
     def calculate_hash(self) -> str:
         """Calculate the hash of the block"""
-        block_string = f"{self.index}{self.timestamp}{self.data}{self.previous_hash}{self.nonce}"
-        return hashlib.sha256(block_string.encode()).hexdigest()
+        hash_obj = hashlib.sha256(self.hash_prefix())
+        hash_obj.update(b"%d" % self.nonce)
+        return hash_obj.hexdigest()
+    
+    def payload(self) -> Dict:
+        """Block data as a dict, parsed on first use unless set when mining"""
+        try:
+            return self._parsed
+        except AttributeError:
+            self._parsed = orjson.loads(self.data)
+            return self._parsed
+
+
+def _merkle_leaf(kd_code_hash: str) -> bytes:
+    """Hash a KD-Code hash into a Merkle tree leaf"""
+    return hashlib.sha256(kd_code_hash.encode()).digest()
+
+
+def _merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """
+    Build every level of a Merkle tree, leaves first
+    
+    Odd-sized levels pair their last node with itself.
+    
+    Args:
+        leaves: Leaf hashes
+    
+    Returns:
+        List of levels, the last one holding only the root
+    """
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([
+            hashlib.sha256(level[i] + level[min(i + 1, len(level) - 1)]).digest()
+            for i in range(0, len(level), 2)
+        ])
+    return levels
+
+
+def verify_merkle_proof(kd_code_hash: str, proof: Dict) -> bool:
+    """
+    Check a Merkle inclusion proof produced by KDCodeBlockchain.get_merkle_proof
+    
+    Args:
+        kd_code_hash: Hash of the KD-Code the proof is for
+        proof: Proof with 'merkle_root' and 'path'
+    
+    Returns:
+        True if the proof links the KD-Code hash to the Merkle root
+    """
+    node = _merkle_leaf(kd_code_hash)
+    for step in proof['path']:
+        sibling = bytes.fromhex(step['hash'])
+        node = hashlib.sha256(sibling + node if step['position'] == 'left' else node + sibling).digest()
+    return node.hex() == proof['merkle_root']
+
+
+def _mine_hashlib(prefix: bytes, difficulty: int, start_nonce: int) -> Tuple[int, str]:
+    """
+    Find the first nonce whose block hash has the required leading zeros
+    
+    Args:
+        prefix: Serialized invariant part of the block (see Block.hash_prefix)
+        difficulty: Number of leading hex zeros required
+        start_nonce: First nonce to try
+    
+    Returns:
+        Tuple of (nonce, block hash as hex string)
+    """
+    # d leading hex zeros means d // 2 zero bytes, plus a zero high nibble when d is odd
+    full, half = divmod(difficulty, 2)
+    zero_bytes = bytes(full)
+    # Absorb the invariant prefix once; each attempt copies the 32-byte state
+    # and hashes only the nonce digits
+    midstate = hashlib.sha256(prefix)
+    for nonce in count(start_nonce):
+        hash_obj = midstate.copy()
+        hash_obj.update(b"%d" % nonce)
+        digest = hash_obj.digest()
+        if digest.startswith(zero_bytes) and (not half or digest[full] < 16):
+            return nonce, digest.hex()
+
+
+# Full audits of longer chains re-hash blocks on a thread pool
+_PARALLEL_AUDIT_THRESHOLD = 1000
+
+_selected_miner = None
+
+
+def _select_miner():
+    """
+    Pick the fastest mining backend that works on this machine
+    
+    Backends are tried fastest first and each must reproduce the hashlib
+    result on a small self-test before it is used, so a numba install that
+    fails to compile or miscompiles for this CPU falls back cleanly.
+    
+    Returns:
+        Callable with the _mine_hashlib signature
+    """
+    global _selected_miner
+    if _selected_miner is None:
+        candidates = [mine_numba] if NUMBA_AVAILABLE else []
+        expected = _mine_hashlib(b"kd-code-self-test", 2, 0)
+        _selected_miner = _mine_hashlib
+        for miner in candidates:
+            try:
+                if miner(b"kd-code-self-test", 2, 0) == expected:
+                    _selected_miner = miner
+                    break
+                logger.warning(f"Mining backend {miner.__name__} failed its self-test")
+            except Exception as e:
+                logger.warning(f"Mining backend {miner.__name__} unavailable: {e}")
+    return _selected_miner
 
 
 class KDCodeBlockchain:
     """Blockchain implementation for KD-Code authenticity verification"""
     
-    def __init__(self, difficulty: int = 4):
+    def __init__(self, difficulty: Optional[int] = 4):
         """
         Initialize the blockchain
         
         Args:
-            difficulty: Mining difficulty (number of leading zeros required)
+            difficulty: Mining difficulty (number of leading zeros required),
+                or None to calibrate it against the measured hash rate
         """
         self.chain: List[Block] = []
         self.difficulty = difficulty
         self.pending_verification = []  # Pending KD-Codes awaiting verification
         self.mining_reward = 1  # Reward for mining a block
+        self._mine = _select_miner()  # Mining backend used by proof_of_work
+        self._index: Dict[str, List[Tuple[int, Dict]]] = {}  # kd_code_hash -> [(block_index, verification)]
+        self._validated_up_to = 1  # Blocks below this index have already passed validation
+        # Raw 32-byte block hashes and previous hashes, row i for block i, so
+        # chain links can be checked with one vectorized compare
+        self._hash_arr = np.empty((16, 32), dtype=np.uint8)
+        self._prev_arr = np.empty((16, 32), dtype=np.uint8)
         
         # Create genesis block
         self.create_genesis_block()
+        
+        if difficulty is None:
+            self.difficulty = self._calibrate_difficulty()
+    
+    def _calibrate_difficulty(self, target_seconds: float = 1.0, sample_seconds: float = 0.1) -> int:
+        """
+        Measure the mining backend's hash rate and pick a matching difficulty
+        
+        Args:
+            target_seconds: Desired expected time to mine a block
+            sample_seconds: How long to measure the hash rate for
+        
+        Returns:
+            Difficulty whose expected solve time is closest to target_seconds
+        """
+        prefix = self.get_latest_block().hash_prefix()
+        # Warm up first so compiling the numba kernel is not counted
+        nonce, _ = self._mine(prefix, 1, 0)
+        
+        start = nonce
+        began = time.perf_counter()
+        while time.perf_counter() - began < sample_seconds:
+            nonce, _ = self._mine(prefix, 2, nonce + 1)
+        hash_rate = (nonce - start) / (time.perf_counter() - began)
+        
+        # Each extra leading hex zero multiplies the expected attempts by 16
+        return max(1, round(math.log(max(hash_rate * target_seconds, 1), 16)))
     
     def create_genesis_block(self):
         """Create the first block in the chain"""
         genesis_block = Block(
             index=0,
             timestamp=time.time(),
-            data="Genesis Block - KD-Code Blockchain",
-            previous_hash="0" * 64  # 64 zeros
+            data=b"Genesis Block - KD-Code Blockchain",
+            previous_hash="0" * 64,  # 64 zeros
+            nonce=0,
+            hash="",
+            merkle_root=""
         )
         genesis_block.hash = genesis_block.calculate_hash()
-        self.chain.append(genesis_block)
+        self._append_block(genesis_block)
+    
+    def _append_block(self, block: Block):
+        """Append a block to the chain and record its hash links"""
+        row = len(self.chain)
+        if row == len(self._hash_arr):
+            self._hash_arr = np.concatenate([self._hash_arr, np.empty_like(self._hash_arr)])
+            self._prev_arr = np.concatenate([self._prev_arr, np.empty_like(self._prev_arr)])
+        self._hash_arr[row] = np.frombuffer(bytes.fromhex(block.hash), dtype=np.uint8)
+        self._prev_arr[row] = np.frombuffer(bytes.fromhex(block.previous_hash), dtype=np.uint8)
+        self.chain.append(block)
     
     def get_latest_block(self) -> Block:
         """Get the most recent block in the chain"""
@@ -102,25 +289,38 @@ class KDCodeBlockchain:
             return None
         
         # Create data for the block (serialize pending verifications)
-        block_data = json.dumps({
+        payload = {
             'verifications': self.pending_verification,
             'miner': miner_address,
             'reward': self.mining_reward
-        }, sort_keys=True)
+        }
+        block_data = orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
         
         # Create new block
         new_block = Block(
             index=len(self.chain),
             timestamp=time.time(),
             data=block_data,
-            previous_hash=self.get_latest_block().hash
+            previous_hash=self.get_latest_block().hash,
+            nonce=0,
+            hash="",
+            merkle_root=_merkle_levels([
+                _merkle_leaf(v['kd_code_hash']) for v in self.pending_verification
+            ])[-1][0].hex()
         )
         
+        # Keep the payload we just serialized so queries never re-parse it
+        new_block._parsed = payload
+        
         # Perform proof of work
         new_block = self.proof_of_work(new_block)
         
         # Add block to chain
-        self.chain.append(new_block)
+        self._append_block(new_block)
+        
+        # Index the verifications so lookups don't have to scan the chain
+        for verification in self.pending_verification:
+            self._index.setdefault(verification['kd_code_hash'], []).append((new_block.index, verification))
         
         # Clear pending verifications
         self.pending_verification = []
@@ -137,33 +337,58 @@ class KDCodeBlockchain:
         Returns:
             Mined block with correct nonce
         """
-        target = '0' * self.difficulty
+        if block.hash.startswith('0' * self.difficulty):
+            return block
         
-        while block.hash[:self.difficulty] != target:
-            block.nonce += 1
-            block.hash = block.calculate_hash()
+        # The prefix is serialized once; only the nonce changes between attempts
+        block.nonce, block.hash = self._mine(block.hash_prefix(), self.difficulty, block.nonce + 1)
         
         return block
     
-    def is_chain_valid(self) -> bool:
+    def is_chain_valid(self, full_audit: bool = False) -> bool:
         """
-        Validate the entire blockchain
+        Validate the blockchain
+        
+        Blocks are only re-hashed the first time they are validated; later
+        calls just check the blocks appended since. Use full_audit to
+        re-hash every block, e.g. after loading a chain from storage.
+        
+        Args:
+            full_audit: Re-validate every block instead of only new ones
         
         Returns:
             True if chain is valid, False otherwise
         """
-        for i in range(1, len(self.chain)):
-            current_block = self.chain[i]
-            previous_block = self.chain[i-1]
-            
-            # Check if current block hash is valid
-            if current_block.hash != current_block.calculate_hash():
-                return False
-            
-            # Check if previous hash matches
-            if current_block.previous_hash != previous_block.hash:
-                return False
+        start = 1 if full_audit else self._validated_up_to
+        end = len(self.chain)
+        
+        if end - start > _PARALLEL_AUDIT_THRESHOLD:
+            # Blocks hash independently and hashlib releases the GIL on large
+            # buffers, so long audits spread across threads
+            with ThreadPoolExecutor() as executor:
+                matches = executor.map(lambda b: b.hash == b.calculate_hash(), self.chain[start:end])
+                if not all(matches):
+                    return False
+        else:
+            for i in range(start, end):
+                current_block = self.chain[i]
+                
+                # Check if current block hash is valid
+                if current_block.hash != current_block.calculate_hash():
+                    return False
+        
+        if full_audit:
+            # Re-read the links from the blocks themselves in case they were modified
+            hashes = np.array([np.frombuffer(bytes.fromhex(b.hash), dtype=np.uint8) for b in self.chain])
+            prev_hashes = np.array([np.frombuffer(bytes.fromhex(b.previous_hash), dtype=np.uint8) for b in self.chain])
+        else:
+            hashes, prev_hashes = self._hash_arr, self._prev_arr
         
+        # Check that every previous hash matches the block before it
+        if not np.array_equal(prev_hashes[start:end], hashes[start - 1:end - 1]):
+            return False
+        
+        self._validated_up_to = len(self.chain)
         return True
     
     def verify_kd_code(self, kd_code_hash: str) -> Dict[str, any]:
@@ -176,29 +401,55 @@ class KDCodeBlockchain:
         Returns:
             Verification result with details
         """
-        # Search through all blocks for the KD-Code hash
-        for block in self.chain:
-            try:
-                block_data = json.loads(block.data)
-                if 'verifications' in block_data:
-                    for verification in block_data['verifications']:
-                        if verification.get('kd_code_hash') == kd_code_hash:
-                            return {
-                                'valid': True,
-                                'block_index': block.index,
-                                'timestamp': verification.get('timestamp'),
-                                'metadata': verification.get('metadata', {}),
-                                'verified_at': block.timestamp
-                            }
-            except json.JSONDecodeError:
-                # Skip blocks with invalid JSON data
-                continue
+        records = self._index.get(kd_code_hash)
+        if records:
+            block_index, verification = records[0]
+            return {
+                'valid': True,
+                'block_index': block_index,
+                'timestamp': verification.get('timestamp'),
+                'metadata': verification.get('metadata', {}),
+                'verified_at': self.chain[block_index].timestamp
+            }
         
         return {
             'valid': False,
             'error': 'KD-Code not found in blockchain'
         }
     
+    def get_merkle_proof(self, kd_code_hash: str) -> Optional[Dict]:
+        """
+        Build a Merkle inclusion proof for a KD-Code
+        
+        Args:
+            kd_code_hash: Hash of the KD-Code to prove
+        
+        Returns:
+            Proof with the block index, Merkle root and sibling path, or None if not found
+        """
+        records = self._index.get(kd_code_hash)
+        if not records:
+            return None
+        
+        block = self.chain[records[0][0]]
+        verifications = block.payload()['verifications']
+        position = next(i for i, v in enumerate(verifications) if v['kd_code_hash'] == kd_code_hash)
+        
+        path = []
+        for level in _merkle_levels([_merkle_leaf(v['kd_code_hash']) for v in verifications])[:-1]:
+            sibling = min(position ^ 1, len(level) - 1)
+            path.append({
+                'hash': level[sibling].hex(),
+                'position': 'left' if sibling < position else 'right'
+            })
+            position //= 2
+        
+        return {
+            'block_index': block.index,
+            'merkle_root': block.merkle_root,
+            'path': path
+        }
+    
     def get_verification_history(self, kd_code_hash: str) -> List[Dict]:
         """
         Get the verification history for a KD-Code
@@ -211,21 +462,16 @@ class KDCodeBlockchain:
         """
         history = []
         
-        for block in self.chain:
-            try:
-                block_data = json.loads(block.data)
-                if 'verifications' in block_data:
-                    for verification in block_data['verifications']:
-                        if verification.get('kd_code_hash') == kd_code_hash:
-                            history.append({
-                                'block_index': block.index,
-                                'timestamp': verification.get('timestamp'),
-                                'metadata': verification.get('metadata', {}),
-                                'miner': block_data.get('miner'),
-                                'block_timestamp': block.timestamp
-                            })
-            except json.JSONDecodeError:
-                continue
+        for block_index, verification in self._index.get(kd_code_hash, ()):
+            block = self.chain[block_index]
+            block_data = block.payload()
+            history.append({
+                'block_index': block_index,
+                'timestamp': verification.get('timestamp'),
+                'metadata': verification.get('metadata', {}),
+                'miner': block_data.get('miner'),
+                'block_timestamp': block.timestamp
+            })
         
         return history
 
@@ -240,10 +486,9 @@ class KDCodeAuthenticator:
         self._generate_keys()
     
     def _generate_keys(self):
-        """Generate RSA key pair for signing"""
-        key = RSA.generate(2048)
-        self.private_key = key
-        self.public_key = key.publickey()
+        """Generate Ed25519 key pair for signing"""
+        self.private_key = ed25519.Ed25519PrivateKey.generate()
+        self.public_key = self.private_key.public_key()
     
     def sign_kd_code_data(self, kd_code_data: str) -> str:
         """
@@ -258,11 +503,8 @@ class KDCodeAuthenticator:
         if not self.private_key:
             raise ValueError("Private key not available")
         
-        # Hash the data
-        hashed = SHA256.new(kd_code_data.encode('utf-8'))
-        
-        # Sign the hash
-        signature = pkcs1_15.new(self.private_key).sign(hashed)
+        # Sign the data (Ed25519 hashes internally)
+        signature = self.private_key.sign(kd_code_data.encode('utf-8'))
         
         # Return base64 encoded signature
         return base64.b64encode(signature).decode('utf-8')
@@ -282,13 +524,10 @@ class KDCodeAuthenticator:
             # Decode the signature
             decoded_sig = base64.b64decode(signature.encode('utf-8'))
             
-            # Hash the data
-            hashed = SHA256.new(kd_code_data.encode('utf-8'))
-            
             # Verify the signature
-            pkcs1_15.new(self.public_key).verify(hashed, decoded_sig)
+            self.public_key.verify(decoded_sig, kd_code_data.encode('utf-8'))
             return True
-        except (ValueError, TypeError):
+        except (InvalidSignature, ValueError, TypeError):
             return False
     
     def register_kd_code(self, text: str, additional_metadata: Dict = None) -> Dict[str, any]:
@@ -364,6 +603,7 @@ class KDCodeAuthenticator:
                 'kd_code_hash': kd_code_hash,
                 'verification_details': verification_result,
                 'history': history,
+                'merkle_proof': self.blockchain.get_merkle_proof(kd_code_hash),
                 'blockchain_valid': self.blockchain.is_chain_valid()
             }
         else:
@@ -401,14 +641,27 @@ class KDCodeAuthenticator:
             }
 
 
-# Global authenticator instance
-authenticator = KDCodeAuthenticator()
+# Global authenticator instance, created on first use so importing this
+# module doesn't build a chain, pick a mining backend or generate keys
+authenticator: Optional[KDCodeAuthenticator] = None
+_authenticator_lock = threading.Lock()
+
+
+def _get_authenticator() -> KDCodeAuthenticator:
+    """Return the global authenticator, creating it on first use"""
+    global authenticator
+    if authenticator is None:
+        with _authenticator_lock:
+            if authenticator is None:
+                authenticator = KDCodeAuthenticator()
+    return authenticator
 
 
 def initialize_blockchain_auth():
     """Initialize the blockchain authentication system"""
     global authenticator
-    authenticator = KDCodeAuthenticator()
+    with _authenticator_lock:
+        authenticator = KDCodeAuthenticator()
 
 
 def register_kd_code_for_auth(text: str, metadata: Dict = None) -> Dict[str, any]:
@@ -422,7 +675,7 @@ def register_kd_code_for_auth(text: str, metadata: Dict = None) -> Dict[str, any
     Returns:
         Registration result
     """
-    return authenticator.register_kd_code(text, metadata)
+    return _get_authenticator().register_kd_code(text, metadata)
 
 
 def authenticate_kd_code(kd_code_hash: str) -> Dict[str, any]:
@@ -435,7 +688,7 @@ def authenticate_kd_code(kd_code_hash: str) -> Dict[str, any]:
     Returns:
         Authentication result
     """
-    return authenticator.authenticate_kd_code(kd_code_hash)
+    return _get_authenticator().authenticate_kd_code(kd_code_hash)
 
 
 def get_authenticity_proof(kd_code_hash: str) -> Dict[str, any]:
@@ -448,7 +701,7 @@ def get_authenticity_proof(kd_code_hash: str) -> Dict[str, any]:
     Returns:
         Detailed authenticity proof
     """
-    return authenticator.get_authenticity_proof(kd_code_hash)
+    return _get_authenticator().get_authenticity_proof(kd_code_hash)
 
 
 def mine_auth_block(miner_address: str = "system") -> Dict[str, any]:
@@ -461,7 +714,7 @@ def mine_auth_block(miner_address: str = "system") -> Dict[str, any]:
     Returns:
         Mining result
     """
-    return authenticator.mine_verification_block(miner_address)
+    return _get_authenticator().mine_verification_block(miner_address)
 
 
 def is_blockchain_valid() -> bool:
@@ -471,7 +724,7 @@ def is_blockchain_valid() -> bool:
     Returns:
         True if blockchain is valid, False otherwise
     """
-    return authenticator.blockchain.is_chain_valid()
+    return _get_authenticator().blockchain.is_chain_valid()
 
 
 # Example usage
@@ -3,13 +3,194 @@ Slack/Microsoft Teams Bot Integration for KD-Code System
 Enables generation and scanning of KD-Codes through workplace messaging platforms
 """
 
-import asyncio
-import json
+import base64
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 import logging
-import requests
-from flask import Flask, request, jsonify
-from functools import wraps
+import orjson
+from flask import Flask, Response, request
+from functools import lru_cache
+
+
+# Shared HTTP session so webhook posts reuse keep-alive connections instead of
+# opening a new TCP/TLS connection per message; created on first send so
+# importing this module doesn't load requests
+_http_session = None
+
+
+def _get_http_session():
+    """Return the shared requests session, creating it on first use"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+    return _http_session
+
+
+# Messages queued within this many seconds are sent as a single post
+_COALESCE_WINDOW = 0.5
+
+# Slack rejects messages with more attachments than this
+_MAX_ATTACHMENTS_PER_MESSAGE = 20
+
+# Attempts per webhook post when the platform answers 429 Too Many Requests
+_MAX_SEND_ATTEMPTS = 3
+
+
+# Bot command: the command word, then everything after the first run of whitespace
+_COMMAND_RE = re.compile(r'\s*(\S+)(?:\s+(.*?))?\s*', re.DOTALL)
+
+# Teams @mention of the bot, e.g. "<at>KD-Code Bot</at> "
+_MENTION_RE = re.compile(r'<at\b[^>]*>.*?</at>\s*', re.DOTALL)
+
+# Accepted spellings of each command, mapped to the handler that serves it
+_COMMAND_ALIASES = {
+    '/generate': 'generate', '/gen': 'generate', '!generate': 'generate', '!gen': 'generate',
+    '/help': 'help', '/info': 'help', '!help': 'help', '!info': 'help',
+    '/scan': 'scan', '!scan': 'scan',
+}
+
+_HELP_TEXT = (
+    "*KD-Code Bot Commands:*\n"
+    "• `/generate <text>` - Generate a KD-Code from text\n"
+    "• `/help` - Show this help message\n"
+    "• `/scan <image_url>` - Scan a KD-Code from an image (coming soon)\n"
+    "• `/history` - Show your recent KD-Code generation history (coming soon)"
+)
+
+
+# Fixed responses, serialized once instead of on every request
+_SLACK_NOT_CONFIGURED_JSON = orjson.dumps({
+    'response_type': 'ephemeral',
+    'text': 'Slack bot is not configured. Contact administrator.'
+})
+_SLACK_ERROR_JSON = orjson.dumps({
+    'response_type': 'ephemeral',
+    'text': 'Error processing command. Please try again.'
+})
+_TEAMS_NOT_CONFIGURED_JSON = orjson.dumps({
+    'type': 'message',
+    'text': 'Teams bot is not configured. Contact administrator.'
+})
+_TEAMS_ERROR_JSON = orjson.dumps({
+    'type': 'message',
+    'text': 'Error processing message. Please try again.'
+})
+
+
+# Static parts of the Teams payloads; only the per-message fields are filled in per call
+_TEAMS_MESSAGE_CARD = {
+    '@type': 'MessageCard',
+    '@context': 'http://schema.org/extensions',
+    'themeColor': '0076D7',
+    'summary': 'KD-Code Notification'
+}
+_ADAPTIVE_CARD_CONTENT = {
+    'type': 'AdaptiveCard',
+    '$schema': 'http://adaptivecards.io/schemas/adaptive-card.json',
+    'version': '1.2'
+}
+
+
+def _adaptive_card(title: str, image_url: str) -> Dict[str, Any]:
+    """Build a Teams Adaptive Card attachment showing a titled image"""
+    return {
+        'contentType': 'application/vnd.microsoft.card.adaptive',
+        'content': {
+            **_ADAPTIVE_CARD_CONTENT,
+            'body': [
+                {'type': 'TextBlock', 'text': title, 'wrap': True},
+                {'type': 'Image', 'url': image_url, 'altText': 'Generated KD-Code'}
+            ]
+        }
+    }
+
+
+def _json_response(body, status: int = 200) -> Response:
+    """Build a JSON response from an object or pre-serialized bytes using orjson"""
+    if not isinstance(body, bytes):
+        body = orjson.dumps(body)
+    return Response(body, status=status, mimetype='application/json')
+
+
+@lru_cache(maxsize=4096)
+def _cached_generate(text: str) -> bytes:
+    """Generate a KD-Code PNG with default settings, reusing earlier results for the same text"""
+    from kd_core.encoder import generate_kd_code_bytes
+    # Quality 100 makes the encoder write PNG; lower values produce JPEG
+    return generate_kd_code_bytes(text, compression_quality=100)
+
+
+# Runs slow follow-up work (rendering, response_url posts) after a route has replied
+_background_executor = ThreadPoolExecutor(max_workers=4)
+
+
+def _respond_with_kd_code(response_url: str, text: str):
+    """Generate a KD-Code and deliver it to a Slack interaction's response_url"""
+    logger = logging.getLogger(__name__)
+    try:
+        kd_code_b64 = base64.b64encode(_cached_generate(text)).decode('utf-8')
+        response_payload = {
+            'text': f'Generated KD-Code for: "{text}"',
+            'attachments': [{
+                'title': f'KD-Code for: {text[:50]}{"..." if len(text) > 50 else ""}',
+                'image_url': f'data:image/png;base64,{kd_code_b64}'
+            }]
+        }
+    except Exception as e:
+        logger.error(f"Error generating KD-Code for Slack interaction: {e}")
+        response_payload = {'text': 'Error generating KD-Code'}
+    
+    try:
+        _get_http_session().post(response_url, json=response_payload)
+    except Exception as e:
+        logger.error(f"Error posting to Slack response_url: {e}")
+
+
+def _inline_images(attachments: list) -> list:
+    """Replace binary 'image_bytes' attachments with base64 data-URI 'image_url' ones"""
+    inlined = []
+    for attachment in attachments:
+        if 'image_bytes' in attachment:
+            attachment = dict(attachment)
+            image_b64 = base64.b64encode(attachment.pop('image_bytes')).decode('ascii')
+            attachment['image_url'] = f'data:image/png;base64,{image_b64}'
+        inlined.append(attachment)
+    return inlined
+
+
+class _TokenBucket:
+    """
+    Token-bucket rate limiter; acquire() blocks until a token is available
+    """
+    
+    def __init__(self, rate: float, capacity: int):
+        """
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            # Reserve the token now; callers queue up behind each other's wait
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
 
 
 class KDCodeBot:
@@ -30,10 +211,89 @@ class KDCodeBot:
         self.webhook_url = webhook_url
         self.api_token = api_token
         self.logger = logging.getLogger(__name__)
+        # Incoming webhooks allow about one message per second, with short bursts
+        self._bucket = _TokenBucket(rate=1.0, capacity=5)
+        self._queue = deque()  # (message, channel, attachments) awaiting the next flush
+        self._queue_lock = threading.Lock()
+        self._flush_timer = None
+        self.failed_posts = 0  # Coalesced posts the platform rejected
+        self._handlers = {
+            'generate': self._handle_generate,
+            'help': self._handle_help,
+            'scan': self._handle_scan,
+        }
     
     def send_message(self, message: str, channel: str = None, attachments: list = None) -> bool:
         """
-        Send a message to the platform
+        Queue a message for the platform
+        
+        Messages queued within the coalescing window are combined into one
+        post per channel, which keeps bursts under the webhook rate limit.
+        
+        Args:
+            message: Message text to send
+            channel: Channel to send to (if applicable)
+            attachments: List of attachments (images, files, etc.)
+        
+        Returns:
+            True if queued, False if the platform is unsupported
+        """
+        if self.platform not in ('slack', 'teams'):
+            self.logger.error(f"Unsupported platform: {self.platform}")
+            return False
+        
+        with self._queue_lock:
+            self._queue.append((message, channel, attachments))
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(_COALESCE_WINDOW, self._flush)
+                # Don't hold up interpreter exit; call flush() to send what is queued
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+        return True
+    
+    def flush(self):
+        """Send queued messages now instead of waiting for the coalescing window"""
+        with self._queue_lock:
+            timer = self._flush_timer
+        if timer is not None:
+            timer.cancel()
+        self._flush()
+    
+    def _flush(self):
+        """Send everything queued by send_message, one post per channel"""
+        with self._queue_lock:
+            queued = list(self._queue)
+            self._queue.clear()
+            self._flush_timer = None
+        
+        # Messages for different channels can't share a post
+        by_channel = {}
+        for message, channel, attachments in queued:
+            texts, files = by_channel.setdefault(channel, ([], []))
+            texts.append(message)
+            if attachments:
+                files.extend(attachments)
+        
+        for channel, (texts, files) in by_channel.items():
+            text = '\n---\n'.join(texts)
+            chunks = [
+                files[i:i + _MAX_ATTACHMENTS_PER_MESSAGE]
+                for i in range(0, len(files), _MAX_ATTACHMENTS_PER_MESSAGE)
+            ] or [None]
+            for chunk in chunks:
+                # send_message already reported success when it queued, so
+                # failures can only be surfaced here
+                if not self.send_message_immediate(text, channel, chunk):
+                    self.failed_posts += 1
+                    self.logger.error(
+                        f"Failed to post {len(texts)} coalesced message(s) to "
+                        f"{self.platform} channel {channel or 'default'}"
+                    )
+                text = ''
+    
+    def send_message_immediate(self, message: str, channel: str = None, attachments: list = None) -> bool:
+        """
+        Send a message to the platform right away, bypassing coalescing
         
         Args:
             message: Message text to send
@@ -61,28 +321,66 @@ class KDCodeBot:
             payload['channel'] = channel
         
         if attachments:
-            payload['attachments'] = attachments
+            if self.api_token and channel:
+                # Upload binary images as files instead of inflating them into base64 data URIs
+                remaining = []
+                for attachment in attachments:
+                    if 'image_bytes' in attachment:
+                        if not self._upload_slack_file(attachment['image_bytes'], attachment.get('title', 'KD-Code'), channel):
+                            remaining.append(attachment)
+                    else:
+                        remaining.append(attachment)
+                attachments = remaining
+            
+            if attachments:
+                payload['attachments'] = _inline_images(attachments)
         
+        return self._post_webhook(payload, 'Slack')
+    
+    def _upload_slack_file(self, image_bytes: bytes, title: str, channel: str) -> bool:
+        """
+        Upload an image to a Slack channel as a binary file
+        
+        Args:
+            image_bytes: Encoded image
+            title: Title shown with the file
+            channel: Channel ID to share the file in
+        
+        Returns:
+            True if successful, False otherwise
+        """
+        headers = {'Authorization': f'Bearer {self.api_token}'}
         try:
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
+            upload = self._post_with_backoff(
+                'https://slack.com/api/files.getUploadURLExternal',
+                headers=headers,
+                data={'filename': 'kd_code.png', 'length': len(image_bytes)}
+            ).json()
+            if not upload.get('ok'):
+                self.logger.error(f"Error requesting Slack upload URL: {upload.get('error')}")
+                return False
             
-            return response.status_code == 200
+            # The upload URL is a plain file endpoint, not a rate-limited Web API method
+            response = _get_http_session().post(upload['upload_url'], files={'file': ('kd_code.png', image_bytes, 'image/png')})
+            if response.status_code != 200:
+                self.logger.error(f"Error uploading file to Slack: HTTP {response.status_code}")
+                return False
+            
+            complete = self._post_with_backoff(
+                'https://slack.com/api/files.completeUploadExternal',
+                headers=headers,
+                json={'files': [{'id': upload['file_id'], 'title': title}], 'channel_id': channel}
+            ).json()
+            return bool(complete.get('ok'))
         except Exception as e:
-            self.logger.error(f"Error sending Slack message: {e}")
+            self.logger.error(f"Error uploading file to Slack: {e}")
             return False
     
     def _send_teams_message(self, message: str, channel: str = None, attachments: list = None) -> bool:
         """Send a message to Microsoft Teams"""
         # Teams uses a different webhook format
         payload = {
-            '@type': 'MessageCard',
-            '@context': 'http://schema.org/extensions',
-            'themeColor': '0076D7',
-            'summary': 'KD-Code Notification',
+            **_TEAMS_MESSAGE_CARD,
             'sections': [{
                 'activityTitle': 'KD-Code System',
                 'activitySubtitle': message,
@@ -93,24 +391,80 @@ class KDCodeBot:
         if attachments:
             # Add images to the message
             images = []
-            for attachment in attachments:
+            for attachment in _inline_images(attachments):
                 if 'image_url' in attachment:
                     images.append({'image': attachment['image_url']})
             
             if images:
                 payload['sections'][0]['images'] = images
         
+        return self._post_webhook(payload, 'Teams')
+    
+    def _post_webhook(self, payload: Dict[str, Any], platform_name: str) -> bool:
+        """
+        Post a payload to the webhook, respecting the platform's rate limit
+        
+        Args:
+            payload: JSON payload to send
+            platform_name: Platform name used in log messages
+        
+        Returns:
+            True if successful, False otherwise
+        """
         try:
-            response = requests.post(
-                self.webhook_url,
-                json=payload,
-                headers={'Content-Type': 'application/json'}
-            )
-            
+            response = self._post_with_backoff(self.webhook_url, json=payload)
+            if response.status_code == 429:
+                self.logger.error(f"Dropped {platform_name} message after {_MAX_SEND_ATTEMPTS} rate-limited attempts")
+                return False
             return response.status_code == 200
         except Exception as e:
-            self.logger.error(f"Error sending Teams message: {e}")
+            self.logger.error(f"Error sending {platform_name} message: {e}")
+            return False
+    
+    def _post_with_backoff(self, url: str, **kwargs):
+        """
+        POST through the bot's rate limiter, retrying on 429 Too Many Requests
+        
+        Args:
+            url: URL to post to
+            **kwargs: Passed through to requests
+        
+        Returns:
+            The last response, which is still 429 if every attempt was rate limited
+        """
+        for attempt in range(_MAX_SEND_ATTEMPTS):
+            self._bucket.acquire()
+            response = _get_http_session().post(url, **kwargs)
+            if response.status_code != 429:
+                return response
+            
+            # Rate limited: wait as instructed, backing off further on each retry
+            if attempt + 1 < _MAX_SEND_ATTEMPTS:
+                retry_after = float(response.headers.get('Retry-After', 1))
+                time.sleep(retry_after * 2 ** attempt)
+        return response
+    
+    def send_kd_code(self, text: str, channel: str = None) -> bool:
+        """
+        Generate a KD-Code and post it to the platform as an image
+        
+        Args:
+            text: Text to encode in the KD-Code
+            channel: Channel to send to (if applicable)
+        
+        Returns:
+            True if queued, False otherwise
+        """
+        try:
+            image_bytes = _cached_generate(text)
+        except Exception as e:
+            self.logger.error(f"Error generating KD-Code for message: {e}")
             return False
+        
+        return self.send_message(f'Generated KD-Code for: "{text}"', channel, [{
+            'title': f'KD-Code for: {text[:50]}{"..." if len(text) > 50 else ""}',
+            'image_bytes': image_bytes
+        }])
     
     def generate_kd_code_from_command(self, text: str, user_id: str = None) -> Optional[str]:
         """
@@ -124,10 +478,8 @@ class KDCodeBot:
             Base64 encoded KD-Code image or None if failed
         """
         try:
-            from kd_core.encoder import generate_kd_code
-            
-            # Generate the KD-Code
-            kd_code_b64 = generate_kd_code(text)
+            # Generate the KD-Code (cached per text, the encoder is deterministic)
+            kd_code_b64 = base64.b64encode(_cached_generate(text)).decode('utf-8')
             
             # Log the generation event
             self.logger.info(f"KD-Code generated via bot for user {user_id}: {text[:50]}...")
@@ -149,72 +501,73 @@ class KDCodeBot:
         Returns:
             Response dictionary
         """
-        command_parts = command.strip().split(' ', 1)
-        cmd = command_parts[0].lower()
-        
-        if cmd in ['/generate', '/gen', '!generate', '!gen']:
-            if len(command_parts) < 2:
-                return {
-                    'response_type': 'ephemeral',
-                    'text': 'Usage: /generate <text_to_encode>\nExample: /generate Hello World'
-                }
-            
-            text_to_encode = command_parts[1]
-            
-            # Generate KD-Code
-            kd_code_b64 = self.generate_kd_code_from_command(text_to_encode, user_id)
-            
-            if kd_code_b64:
-                # Create attachment with the KD-Code image
-                attachment = {
-                    'title': f'Generated KD-Code for: {text_to_encode[:50]}{"..." if len(text_to_encode) > 50 else ""}',
-                    'image_url': f'data:image/png;base64,{kd_code_b64}'
-                }
-                
-                return {
-                    'response_type': 'in_channel',
-                    'text': f'Generated KD-Code for: "{text_to_encode}"',
-                    'attachments': [attachment]
-                }
-            else:
-                return {
-                    'response_type': 'ephemeral',
-                    'text': 'Error: Failed to generate KD-Code. Please try again.'
-                }
-        
-        elif cmd in ['/help', '/info', '!help', '!info']:
-            help_text = (
-                "*KD-Code Bot Commands:*\n"
-                "• `/generate <text>` - Generate a KD-Code from text\n"
-                "• `/help` - Show this help message\n"
-                "• `/scan <image_url>` - Scan a KD-Code from an image (coming soon)\n"
-                "• `/history` - Show your recent KD-Code generation history (coming soon)"
-            )
-            
+        match = _COMMAND_RE.fullmatch(command)
+        if not match:
+            return self._handle_unknown('')
+        
+        cmd = match.group(1).lower()
+        args = match.group(2) or ''
+        handler = self._handlers.get(_COMMAND_ALIASES.get(cmd))
+        if handler is None:
+            return self._handle_unknown(cmd)
+        return handler(args, user_id, channel)
+    
+    def _handle_generate(self, text_to_encode: str, user_id: str = None, channel: str = None) -> Dict[str, Any]:
+        """Handle /generate <text>"""
+        if not text_to_encode:
             return {
                 'response_type': 'ephemeral',
-                'text': help_text
+                'text': 'Usage: /generate <text_to_encode>\nExample: /generate Hello World'
             }
         
-        elif cmd in ['/scan', '!scan']:
-            if len(command_parts) < 2:
-                return {
-                    'response_type': 'ephemeral',
-                    'text': 'Usage: /scan <image_url>\nExample: /scan https://example.com/image.png'
-                }
+        # Generate KD-Code
+        kd_code_b64 = self.generate_kd_code_from_command(text_to_encode, user_id)
+        
+        if kd_code_b64:
+            # Create attachment with the KD-Code image
+            attachment = {
+                'title': f'Generated KD-Code for: {text_to_encode[:50]}{"..." if len(text_to_encode) > 50 else ""}',
+                'image_url': f'data:image/png;base64,{kd_code_b64}'
+            }
             
-            image_url = command_parts[1]
-            # For now, just acknowledge the command - scanning implementation would go here
             return {
-                'response_type': 'ephemeral',
-                'text': f'Scanning KD-Code from: {image_url}\n(Scanning functionality coming soon)'
+                'response_type': 'in_channel',
+                'text': f'Generated KD-Code for: "{text_to_encode}"',
+                'attachments': [attachment]
             }
-        
         else:
             return {
                 'response_type': 'ephemeral',
-                'text': f'Unknown command: {cmd}\nUse `/help` to see available commands.'
+                'text': 'Error: Failed to generate KD-Code. Please try again.'
+            }
+    
+    def _handle_help(self, args: str, user_id: str = None, channel: str = None) -> Dict[str, Any]:
+        """Handle /help"""
+        return {
+            'response_type': 'ephemeral',
+            'text': _HELP_TEXT
+        }
+    
+    def _handle_scan(self, image_url: str, user_id: str = None, channel: str = None) -> Dict[str, Any]:
+        """Handle /scan <image_url>"""
+        if not image_url:
+            return {
+                'response_type': 'ephemeral',
+                'text': 'Usage: /scan <image_url>\nExample: /scan https://example.com/image.png'
             }
+        
+        # For now, just acknowledge the command - scanning implementation would go here
+        return {
+            'response_type': 'ephemeral',
+            'text': f'Scanning KD-Code from: {image_url}\n(Scanning functionality coming soon)'
+        }
+    
+    def _handle_unknown(self, cmd: str) -> Dict[str, Any]:
+        """Respond to a command that isn't recognized"""
+        return {
+            'response_type': 'ephemeral',
+            'text': f'Unknown command: {cmd}\nUse `/help` to see available commands.'
+        }
 
 
 class SlackBot(KDCodeBot):
@@ -329,13 +682,8 @@ def handle_teams_message(data: Dict[str, Any]) -> Dict[str, Any]:
             'text': 'Teams bot is not configured. Contact administrator.'
         }
     
-    # Extract text from Teams message
-    text = data.get('text', '')
-    if text.startswith('<at'):  # Remove @mention if present
-        # Find the actual command after the mention
-        parts = text.split('> ')
-        if len(parts) > 1:
-            text = parts[1]
+    # Extract text from Teams message, removing any @mentions
+    text = _MENTION_RE.sub('', data.get('text', ''))
     
     user_id = data.get('from', {}).get('id', '')
     channel = data.get('conversation', {}).get('id', '')
@@ -351,28 +699,10 @@ def handle_teams_message(data: Dict[str, Any]) -> Dict[str, Any]:
     
     if 'attachments' in response:
         # Add card with image for Teams
-        teams_response['attachments'] = []
-        for attachment in response['attachments']:
-            teams_response['attachments'].append({
-                'contentType': 'application/vnd.microsoft.card.adaptive',
-                'content': {
-                    'type': 'AdaptiveCard',
-                    '$schema': 'http://adaptivecards.io/schemas/adaptive-card.json',
-                    'version': '1.2',
-                    'body': [
-                        {
-                            'type': 'TextBlock',
-                            'text': attachment.get('title', 'KD-Code'),
-                            'wrap': True
-                        },
-                        {
-                            'type': 'Image',
-                            'url': attachment['image_url'],
-                            'altText': 'Generated KD-Code'
-                        }
-                    ]
-                }
-            })
+        teams_response['attachments'] = [
+            _adaptive_card(attachment.get('title', 'KD-Code'), attachment['image_url'])
+            for attachment in response['attachments']
+        ]
     
     return teams_response
 
@@ -390,45 +720,45 @@ def add_bot_routes(app: Flask):
     def slack_command():
         """Handle Slack slash commands"""
         try:
+            if not slack_bot:
+                return _json_response(_SLACK_NOT_CONFIGURED_JSON)
+            
             # Verify request is from Slack
-            if slack_bot and not slack_bot.verify_request(request):
+            if not slack_bot.verify_request(request):
                 return "Unauthorized", 401
             
             data = request.form.to_dict()  # Slack sends form data
             response = handle_slack_command(data)
             
-            return jsonify(response)
+            return _json_response(response)
         except Exception as e:
             app.logger.error(f"Error in Slack command handler: {e}")
-            return jsonify({
-                'response_type': 'ephemeral',
-                'text': 'Error processing command. Please try again.'
-            }), 500
+            return _json_response(_SLACK_ERROR_JSON, 500)
     
     @app.route('/bots/teams/message', methods=['POST'])
     def teams_message():
         """Handle Microsoft Teams messages"""
         try:
+            if not teams_bot:
+                return _json_response(_TEAMS_NOT_CONFIGURED_JSON)
+            
             # Verify request is from Teams
-            if teams_bot and not teams_bot.verify_request(request):
+            if not teams_bot.verify_request(request):
                 return "Unauthorized", 401
             
-            data = request.get_json()
+            data = orjson.loads(request.get_data())
             response = handle_teams_message(data)
             
-            return jsonify(response)
+            return _json_response(response)
         except Exception as e:
             app.logger.error(f"Error in Teams message handler: {e}")
-            return jsonify({
-                'type': 'message',
-                'text': 'Error processing message. Please try again.'
-            }), 500
+            return _json_response(_TEAMS_ERROR_JSON, 500)
     
     @app.route('/bots/slack/interactive', methods=['POST'])
     def slack_interactive():
         """Handle Slack interactive components (buttons, menus, etc.)"""
         try:
-            payload = json.loads(request.form.get('payload', '{}'))
+            payload = orjson.loads(request.form.get('payload', '{}'))
             
             # Handle different types of interactive components
             if payload.get('type') == 'block_actions':
@@ -438,27 +768,13 @@ def add_bot_routes(app: Flask):
                 if action_id == 'generate_kd_code':
                     # Extract text from the input field
                     text = payload['state']['values']['text_input']['text']['value']
+                    response_url = payload['response_url']
                     
-                    # Generate KD-Code
-                    from kd_core.encoder import generate_kd_code
-                    kd_code_b64 = generate_kd_code(text)
+                    # Acknowledge right away and render/deliver the KD-Code in the
+                    # background; Slack expects interactions to be acked within 3 seconds
+                    _background_executor.submit(_respond_with_kd_code, response_url, text)
                     
-                    if kd_code_b64:
-                        # Respond with the generated KD-Code
-                        response_url = payload['response_url']
-                        response_payload = {
-                            'text': f'Generated KD-Code for: "{text}"',
-                            'attachments': [{
-                                'title': f'KD-Code for: {text[:50]}{"..." if len(text) > 50 else ""}',
-                                'image_url': f'data:image/png;base64,{kd_code_b64}'
-                            }]
-                        }
-                        
-                        requests.post(response_url, json=response_payload)
-                        
-                        return '', 200
-                    else:
-                        return jsonify({'text': 'Error generating KD-Code'}), 500
+                    return '', 200
             
             return '', 200
         except Exception as e:
@@ -3,10 +3,18 @@ Bulk Import/Export Module for KD-Code System
 Handles importing and exporting of KD-Codes in various formats
 """
 
-import json
 import csv
 import base64
+import codecs
+import hashlib
+import io
+import os
+import re
+import orjson
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from io import StringIO
+from itertools import islice
 from kd_core.encoder import generate_kd_code
 from kd_core.decoder import decode_kd_code
 from kd_core.config import (
@@ -15,49 +23,157 @@ from kd_core.config import (
 )
 
 
+# Header of a data URI such as "data:image/png;base64,"
+_DATA_URI_RE = re.compile(r'^data:image[^,]*,')
+
+# Batches smaller than this are processed in-process; spawning workers costs more than it saves
+_MIN_PARALLEL_BATCH = 32
+
+
+def _encode_one(text, kwargs):
+    """Generate one KD-Code in a worker process"""
+    try:
+        image_base64 = generate_kd_code(text, **kwargs)
+        return {
+            'text': text,
+            'image': image_base64,
+            'status': 'success'
+        }
+    except Exception as e:
+        return {
+            'text': text,
+            'error': str(e),
+            'status': 'error'
+        }
+
+
+def _decode_one(args):
+    """Decode one KD-Code image in a worker process"""
+    idx, image_data = args
+    try:
+        # Decode KD-Code from image
+        if isinstance(image_data, str):
+            # If it's a base64 string (optionally a data URI), decode it first;
+            # skip the header through a memoryview instead of copying the payload
+            header = _DATA_URI_RE.match(image_data)
+            encoded = memoryview(image_data.encode('ascii'))
+            image_bytes = base64.b64decode(encoded[header.end():] if header else encoded)
+        else:
+            image_bytes = image_data
+        
+        decoded_text = decode_kd_code(image_bytes)
+        
+        if decoded_text is None:
+            return {
+                'index': idx,
+                'error': 'No KD-Code detected in image',
+                'status': 'error'
+            }
+        return {
+            'index': idx,
+            'decoded_text': decoded_text,
+            'status': 'success'
+        }
+    except Exception as e:
+        return {
+            'index': idx,
+            'error': str(e),
+            'status': 'error'
+        }
+
+
+def _map_in_workers(func, items):
+    """
+    Apply func to every item, across worker processes for large batches
+    
+    Args:
+        func: Module-level function (or partial of one) to apply
+        items (list): Arguments for each call
+    
+    Returns:
+        list: Results in the same order as items
+    """
+    workers = os.cpu_count() or 1
+    if workers == 1 or len(items) < _MIN_PARALLEL_BATCH:
+        return [func(item) for item in items]
+    
+    chunksize = max(1, len(items) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items, chunksize=chunksize))
+
+
+class _EchoBuffer:
+    """File-like object whose write() returns the data, so csv writers can yield rows"""
+    
+    def write(self, value):
+        return value
+
+
 class BulkProcessor:
     """Handles bulk import and export operations for KD-Codes"""
     
     def __init__(self):
         pass
     
-    def import_from_csv(self, csv_content, text_column='text'):
+    def import_from_csv(self, csv_content, text_column='text', limit=None):
         """
         Import texts from CSV content for KD-Code generation
         
         Args:
-            csv_content (str): CSV formatted string
+            csv_content (str or file): CSV formatted string, or a text or
+                binary (UTF-8) file object that is read row by row
             text_column (str): Name of the column containing text to encode
+            limit (int): Stop reading after this many texts
         
         Returns:
             list: List of texts extracted from CSV
         """
-        # Parse CSV content
-        csv_file = StringIO(csv_content)
-        reader = csv.DictReader(csv_file)
+        return list(islice(self.iter_csv_texts(csv_content, text_column), limit))
+    
+    def iter_csv_texts(self, csv_content, text_column='text'):
+        """
+        Yield texts from CSV content one row at a time
+        
+        Args:
+            csv_content (str or file): CSV formatted string or file object
+            text_column (str): Name of the column containing text to encode
+        
+        Yields:
+            str: Each non-empty text, stripped
+        """
+        if isinstance(csv_content, str):
+            csv_content = StringIO(csv_content)
+        if not isinstance(csv_content, io.TextIOBase):
+            # Binary stream such as an uploaded file: decode as lines arrive
+            csv_content = codecs.iterdecode(csv_content, 'utf-8')
+        reader = csv.reader(csv_content)
+        
+        header = next(reader, [])
+        if text_column not in header:
+            return
+        column = header.index(text_column)
         
-        texts = []
         for row in reader:
-            if text_column in row:
-                text = row[text_column].strip()
+            if len(row) > column:
+                text = row[column].strip()
                 if text:  # Only add non-empty texts
-                    texts.append(text)
-        
-        return texts
+                    yield text
     
     def import_from_json(self, json_content, text_key='text'):
         """
         Import texts from JSON content for KD-Code generation
         
         Args:
-            json_content (str or list): JSON string or list of objects
+            json_content (str, bytes, file or list): JSON document or list of objects
             text_key (str): Key containing the text to encode
         
         Returns:
             list: List of texts extracted from JSON
         """
-        if isinstance(json_content, str):
-            data = json.loads(json_content)
+        if hasattr(json_content, 'read'):
+            json_content = json_content.read()
+        if isinstance(json_content, (str, bytes)):
+            data = orjson.loads(json_content)
         else:
             data = json_content
         
@@ -93,24 +209,32 @@ class BulkProcessor:
         Returns:
             tuple: (CSV content as string, suggested filename)
         """
-        output = StringIO()
-        fieldnames = ['text', 'image', 'status', 'error']
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        
-        writer.writeheader()
-        for result in results:
-            writer.writerow({
-                'text': result.get('text', ''),
-                'image': result.get('image', ''),
-                'status': result.get('status', ''),
-                'error': result.get('error', '')
-            })
-        
-        csv_content = output.getvalue()
+        csv_content = ''.join(self.export_to_csv_stream(results))
         filename = f"{filename_prefix}_{len(results)}_codes.csv"
         
         return csv_content, filename
     
+    def export_to_csv_stream(self, results):
+        """
+        Export KD-Code results to CSV one row at a time
+        
+        Suitable for flask.Response(..., mimetype='text/csv') so large exports
+        never sit in memory as a single string.
+        
+        Args:
+            results (iterable): KD-Code generation results
+        
+        Yields:
+            str: CSV header line, then one line per result
+        """
+        writerow = csv.writer(_EchoBuffer()).writerow
+        
+        yield writerow(('text', 'image', 'status', 'error'))
+        for result in results:
+            # Bind the lookup once per row rather than once per column
+            get = result.get
+            yield writerow((get('text', ''), get('image', ''), get('status', ''), get('error', '')))
+    
     def export_to_json(self, results, filename_prefix='kd_codes'):
         """
         Export KD-Code results to JSON format
@@ -122,11 +246,28 @@ class BulkProcessor:
         Returns:
             tuple: (JSON content as string, suggested filename)
         """
-        json_content = json.dumps(results, indent=2)
+        json_content = orjson.dumps(results, option=orjson.OPT_INDENT_2).decode()
         filename = f"{filename_prefix}_{len(results)}_codes.json"
         
         return json_content, filename
     
+    def export_to_json_stream(self, results):
+        """
+        Export KD-Code results to a JSON array one element at a time
+        
+        Args:
+            results (iterable): KD-Code generation results
+        
+        Yields:
+            str: Pieces of the JSON document, in order
+        """
+        yield '['
+        separator = ''
+        for result in results:
+            yield separator + orjson.dumps(result).decode()
+            separator = ','
+        yield ']'
+    
     def process_bulk_generation(self, texts, **kwargs):
         """
         Process bulk generation of KD-Codes
@@ -138,24 +279,17 @@ class BulkProcessor:
         Returns:
             list: List of generation results
         """
-        results = []
-        for text in texts:
-            try:
-                # Generate KD-Code for each text
-                image_base64 = generate_kd_code(text, **kwargs)
-                results.append({
-                    'text': text,
-                    'image': image_base64,
-                    'status': 'success'
-                })
-            except Exception as e:
-                results.append({
-                    'text': text,
-                    'error': str(e),
-                    'status': 'error'
-                })
+        # Encoding is deterministic, so each distinct text is only rendered once
+        unique_texts = list(dict.fromkeys(texts))
+        # The batch shares one configuration: bind it once so each chunk sent to a
+        # worker carries it a single time instead of once per text
+        encode = partial(_encode_one, kwargs=kwargs)
+        unique_results = _map_in_workers(encode, unique_texts)
+        if len(unique_texts) == len(texts):
+            return unique_results
         
-        return results
+        by_text = dict(zip(unique_texts, unique_results))
+        return [dict(by_text[text]) for text in texts]
     
     def process_bulk_decoding(self, images):
         """
@@ -167,41 +301,35 @@ class BulkProcessor:
         Returns:
             list: List of decoding results
         """
-        results = []
+        # Decoding is deterministic, so identical images are only decoded once
+        first_index = {}
+        duplicates = []
+        unique = []
         for idx, image_data in enumerate(images):
-            try:
-                # Decode KD-Code from image
-                if isinstance(image_data, str):
-                    # If it's a base64 string, decode it first
-                    if image_data.startswith('data:image'):
-                        header, encoded = image_data.split(',', 1)
-                        image_bytes = base64.b64decode(encoded)
-                    else:
-                        image_bytes = base64.b64decode(image_data)
-                else:
-                    image_bytes = image_data
-                
-                decoded_text = decode_kd_code(image_bytes)
-                
-                if decoded_text is None:
-                    results.append({
-                        'index': idx,
-                        'error': 'No KD-Code detected in image',
-                        'status': 'error'
-                    })
-                else:
-                    results.append({
-                        'index': idx,
-                        'decoded_text': decoded_text,
-                        'status': 'success'
-                    })
-            except Exception as e:
-                results.append({
-                    'index': idx,
-                    'error': str(e),
-                    'status': 'error'
-                })
+            if isinstance(image_data, str):
+                raw = image_data.encode()
+            elif isinstance(image_data, (bytes, bytearray, memoryview)):
+                raw = image_data
+            else:
+                # Not image data at all; let _decode_one report the error for it
+                unique.append((idx, image_data))
+                continue
+            key = hashlib.blake2b(raw, digest_size=16).digest()
+            if key in first_index:
+                duplicates.append((idx, first_index[key]))
+            else:
+                first_index[key] = len(unique)
+                unique.append((idx, image_data))
+        
+        unique_results = _map_in_workers(_decode_one, unique)
+        if not duplicates:
+            return unique_results
         
+        results = [None] * len(images)
+        for result in unique_results:
+            results[result['index']] = result
+        for idx, source in duplicates:
+            results[idx] = dict(unique_results[source], index=idx, cached=True)
         return results
 
 
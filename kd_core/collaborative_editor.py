@@ -3,16 +3,55 @@ Collaborative Code Editor for KD-Code System
 Enables real-time collaboration for KD-Code generation and editing
 """
 
-import json
+import hashlib
 import uuid
 import time
-from typing import Dict, List, Optional, Any
-from dataclasses import dataclass, asdict
+from bisect import bisect_right
+from itertools import accumulate, islice
+from collections import deque
+from typing import Deque, Dict, List, Optional, Any, Set, Tuple
+from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+import orjson
 from datetime import datetime
 import asyncio
 import websockets
-from threading import Thread
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+
+def _dumps(message: Dict[str, Any]) -> str:
+    """Serialize a message for a websocket text frame"""
+    return orjson.dumps(message).decode()
+
+
+# Operations kept per document for rebasing late edits; older ones are covered by the snapshot
+_OPERATIONS_LOG_LIMIT = 10_000
+
+# Locks shared by all documents for join/leave; collisions only serialize unrelated membership changes
+_LOCK_STRIPES = 256
+
+# Seconds to collect selection changes before broadcasting the latest per user
+_SELECTION_DEBOUNCE = 0.05
+
+# Applied operations between content snapshots; must not exceed _OPERATIONS_LOG_LIMIT
+_SNAPSHOT_INTERVAL = 1_000
+
+
+def _new_id() -> str:
+    """Random ID for documents, connections and operations (32 hex digits, no dashes)"""
+    return uuid.uuid4().hex
+
+
+@lru_cache(maxsize=4096)
+def _user_color(user_id: str) -> str:
+    """Derive a 24-bit color from the user ID, stable across restarts unlike hash()"""
+    return '#' + hashlib.blake2s(user_id.encode(), digest_size=3).hexdigest()
 
 
 class OperationType(Enum):
@@ -26,30 +65,228 @@ class OperationType(Enum):
     CHAT = "chat"
 
 
+# Plain dict lookup for incoming operation types; OperationType(value) goes through EnumMeta.__call__
+_OPTYPE_BY_VALUE: Dict[str, OperationType] = {member.value: member for member in OperationType}
+
+
 @dataclass
 class User:
     """Represents a user in the collaborative session"""
+    __slots__ = ('user_id', 'username', 'color', 'join_time', '_cached_dict')
+    
     user_id: str
     username: str
     color: str
     join_time: float
+    
+    def __post_init__(self):
+        self._cached_dict = None
+    
+    def to_dict(self):
+        """Convert to dictionary for JSON serialization (built once; do not mutate)"""
+        if self._cached_dict is None:
+            self._cached_dict = {
+                'user_id': self.user_id,
+                'username': self.username,
+                'color': self.color,
+                'join_time': self.join_time
+            }
+        return self._cached_dict
 
 
-@dataclass
 class Operation:
-    """Represents an operation in the collaborative editor"""
-    op_id: str
-    user_id: str
-    operation_type: OperationType
-    position: Optional[int] = None
-    text: Optional[str] = None
-    timestamp: float = 0.0
+    """
+    Represents an operation in the collaborative editor
+    
+    A slotted class rather than a dataclass: one is created per keystroke, and
+    slots with field defaults need Python 3.10's dataclass(slots=True).
+    """
+    __slots__ = (
+        'op_id', 'user_id', 'operation_type', 'position', 'text', 'timestamp',
+        'base_revision', 'revision', 'settings_delta', '_cached_dict'
+    )
+    
+    def __init__(self, op_id: str, user_id: str, operation_type: OperationType,
+                 position: Optional[int] = None, text: Optional[str] = None,
+                 timestamp: float = 0.0, base_revision: Optional[int] = None,
+                 revision: int = 0, settings_delta: Optional[Dict[str, Any]] = None):
+        self.op_id = op_id
+        self.user_id = user_id
+        self.operation_type = operation_type
+        self.position = position
+        self.text = text
+        self.timestamp = timestamp
+        self.base_revision = base_revision  # Document revision the client edited against
+        self.revision = revision  # Revision assigned when the operation is applied
+        self.settings_delta = settings_delta  # Already-parsed KD-Code settings changes for UPDATE
+        self._cached_dict = None
+    
+    def __repr__(self):
+        return (f"Operation(op_id={self.op_id!r}, user_id={self.user_id!r}, "
+                f"operation_type={self.operation_type}, position={self.position!r}, "
+                f"text={self.text!r}, revision={self.revision})")
+    
+    def rebased(self, position: int, text: str) -> 'Operation':
+        """Return a copy of this operation with a new position and text"""
+        return Operation(
+            self.op_id, self.user_id, self.operation_type, position, text,
+            self.timestamp, self.base_revision, self.revision, self.settings_delta
+        )
     
     def to_dict(self):
-        """Convert to dictionary for JSON serialization"""
-        result = asdict(self)
-        result['operation_type'] = self.operation_type.value
-        return result
+        """
+        Convert to dictionary for JSON serialization
+        
+        The dict is built on first use, after the operation has been applied,
+        and shared by every later broadcast and snapshot; do not mutate it.
+        """
+        if self._cached_dict is None:
+            self._cached_dict = {
+                'op_id': self.op_id,
+                'user_id': self.user_id,
+                'operation_type': self.operation_type.value,
+                'position': self.position,
+                'text': self.text,
+                'timestamp': self.timestamp,
+                'base_revision': self.base_revision,
+                'revision': self.revision,
+                'settings_delta': self.settings_delta
+            }
+        return self._cached_dict
+
+
+def transform(operation: Operation, applied: Operation) -> Operation:
+    """
+    Transform an operation against a concurrent operation that was applied first
+    
+    Args:
+        operation: Incoming INSERT or DELETE operation
+        applied: Operation already applied to the document
+    
+    Returns:
+        Operation adjusted to apply after `applied`
+    """
+    if (operation.position is None or operation.text is None or
+            applied.position is None or applied.text is None):
+        return operation
+    
+    pos = operation.position
+    length = len(operation.text)
+    applied_pos = applied.position
+    applied_len = len(applied.text)
+    
+    if applied.operation_type == OperationType.INSERT:
+        if operation.operation_type == OperationType.INSERT:
+            # Ties are broken by (user_id, op_id) so both sides order the two
+            # inserts the same way whichever was applied first
+            if pos > applied_pos or (pos == applied_pos and
+                                     (operation.user_id, operation.op_id) > (applied.user_id, applied.op_id)):
+                return operation.rebased(pos + applied_len, operation.text)
+        elif operation.operation_type == OperationType.DELETE:
+            if pos >= applied_pos:
+                return operation.rebased(pos + applied_len, operation.text)
+            if pos + length > applied_pos:
+                # Text was inserted inside the deleted range; delete it as well,
+                # matching the DELETE-applied case, which drops such an insert
+                split = applied_pos - pos
+                return operation.rebased(pos, operation.text[:split] + applied.text + operation.text[split:])
+    
+    elif applied.operation_type == OperationType.DELETE:
+        applied_end = applied_pos + applied_len
+        if operation.operation_type == OperationType.INSERT:
+            if pos > applied_end:
+                return operation.rebased(pos - applied_len, operation.text)
+            if pos == applied_end:
+                return operation.rebased(applied_pos, operation.text)
+            if pos > applied_pos:
+                # The insert landed inside text that is already deleted; drop it,
+                # as a delete applied after the insert would have swallowed it
+                return operation.rebased(applied_pos, '')
+        elif operation.operation_type == OperationType.DELETE:
+            if pos >= applied_end:
+                return operation.rebased(pos - applied_len, operation.text)
+            if pos + length > applied_pos:
+                # Drop the part of the range that is already gone
+                keep_left = max(0, applied_pos - pos)
+                keep_right = max(0, pos + length - applied_end)
+                return operation.rebased(
+                    min(pos, applied_pos),
+                    operation.text[:keep_left] + operation.text[length - keep_right:]
+                )
+    
+    return operation
+
+
+class TextBuffer:
+    """
+    Chunked text storage for collaborative documents
+    Edits copy only the chunk they touch instead of the whole document
+    """
+
+    # Chunks are split once they grow past twice this size
+    CHUNK_SIZE = 1024
+
+    def __init__(self, text: str = ""):
+        size = self.CHUNK_SIZE
+        self._chunks: List[str] = [text[i:i + size] for i in range(0, len(text), size)]
+        self._length = len(text)
+        self._starts: Optional[List[int]] = None
+        self._joined: Optional[str] = text
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __deepcopy__(self, memo):
+        return TextBuffer(self.text())
+
+    def _locate(self, position: int):
+        """Return (chunk index, offset within chunk) for a clamped position"""
+        if self._starts is None:
+            self._starts = [0, *accumulate(map(len, self._chunks[:-1]))]
+        index = bisect_right(self._starts, position) - 1
+        return index, position - self._starts[index]
+
+    def _invalidate(self):
+        self._starts = None
+        self._joined = None
+
+    def insert(self, position: int, text: str):
+        """Insert text before the given character position"""
+        if not text:
+            return
+        position = min(max(position, 0), self._length)
+        if not self._chunks:
+            self._chunks = TextBuffer(text)._chunks
+        else:
+            index, offset = self._locate(position)
+            chunk = self._chunks[index]
+            merged = chunk[:offset] + text + chunk[offset:]
+            size = self.CHUNK_SIZE
+            if len(merged) > 2 * size:
+                self._chunks[index:index + 1] = [merged[i:i + size] for i in range(0, len(merged), size)]
+            else:
+                self._chunks[index] = merged
+        self._length += len(text)
+        self._invalidate()
+
+    def delete(self, position: int, count: int):
+        """Delete count characters starting at the given position"""
+        start = min(max(position, 0), self._length)
+        end = min(start + max(count, 0), self._length)
+        if start == end:
+            return
+        first, first_offset = self._locate(start)
+        last, last_offset = self._locate(end)
+        merged = self._chunks[first][:first_offset] + self._chunks[last][last_offset:]
+        self._chunks[first:last + 1] = [merged] if merged else []
+        self._length -= end - start
+        self._invalidate()
+
+    def text(self) -> str:
+        """Return the full text, joining the chunks only when it has changed"""
+        if self._joined is None:
+            self._joined = ''.join(self._chunks)
+        return self._joined
 
 
 @dataclass
@@ -57,21 +294,38 @@ class CollaborativeDocument:
     """Represents a collaborative document for KD-Code editing"""
     doc_id: str
     title: str
-    content: str
+    buffer: TextBuffer
     created_at: float
     last_modified: float
     owner_id: str
-    participants: List[User]
-    operations_log: List[Operation]
+    participants: Dict[str, User]  # user_id -> User
+    operations_log: Deque[Operation]  # Most recent operations, oldest evicted first
     kd_code_settings: Dict[str, Any]  # KD-Code generation parameters
+    revision: int = 0  # Number of operations applied so far
+    snapshot_revision: int = 0  # Revision at which snapshot_content was taken
+    snapshot_content: str = ""  # Content checkpoint; replaying the log after it gives content
+    
+    @property
+    def content(self) -> str:
+        """Current document text"""
+        return self.buffer.text()
     
     def to_dict(self):
         """Convert to dictionary for JSON serialization"""
-        result = asdict(self)
-        result['participants'] = [asdict(user) for user in self.participants]
-        result['operations_log'] = [op.to_dict() for op in self.operations_log]
-        result['operation_type'] = self.operation_type.value if hasattr(self, 'operation_type') else None
-        return result
+        return {
+            'doc_id': self.doc_id,
+            'title': self.title,
+            'content': self.content,
+            'created_at': self.created_at,
+            'last_modified': self.last_modified,
+            'owner_id': self.owner_id,
+            'participants': [user.to_dict() for user in self.participants.values()],
+            'operations_log': [op.to_dict() for op in self.operations_log],
+            'kd_code_settings': self.kd_code_settings,
+            'revision': self.revision,
+            'snapshot_revision': self.snapshot_revision,
+            'snapshot_content': self.snapshot_content
+        }
 
 
 class CollaborativeEditor:
@@ -82,9 +336,25 @@ class CollaborativeEditor:
     
     def __init__(self):
         self.documents: Dict[str, CollaborativeDocument] = {}
-        self.connections: Dict[str, websockets.WebSocketServerProtocol] = {}  # user_id -> websocket
-        self.document_sessions: Dict[str, List[str]] = {}  # doc_id -> list of user_ids
-        self.locks: Dict[str, asyncio.Lock] = {}  # doc_id -> lock
+        self.connections: Dict[str, websockets.ServerConnection] = {}  # user_id -> websocket
+        self.document_sessions: Dict[str, Set[str]] = {}  # doc_id -> set of user_ids
+        self.user_docs: Dict[str, Set[str]] = {}  # user_id -> set of doc_ids in session
+        self._lock_stripes: Optional[Tuple[asyncio.Lock, ...]] = None  # Guard membership changes, see _lock()
+        self.doc_queues: Dict[str, asyncio.Queue] = {}  # doc_id -> pending (operation, future) pairs
+        self.doc_workers: Dict[str, asyncio.Task] = {}  # doc_id -> task applying queued operations
+        self.pending_selections: Dict[str, Dict[str, Tuple[int, int]]] = {}  # doc_id -> user_id -> latest selection
+    
+    def _lock(self, doc_id: str) -> asyncio.Lock:
+        """
+        Return the lock guarding a document's membership
+        
+        A fixed set of locks is shared by hashing the document ID, so no lock
+        dict is written per document. The stripes are created on first use so
+        they belong to the running event loop (Python 3.9 locks bind at creation).
+        """
+        if self._lock_stripes is None:
+            self._lock_stripes = tuple(asyncio.Lock() for _ in range(_LOCK_STRIPES))
+        return self._lock_stripes[hash(doc_id) % _LOCK_STRIPES]
     
     async def create_document(self, title: str, owner_id: str, initial_content: str = "", 
                              kd_code_settings: Dict[str, Any] = None) -> str:
@@ -100,7 +370,7 @@ class CollaborativeEditor:
         Returns:
             Document ID
         """
-        doc_id = str(uuid.uuid4())
+        doc_id = _new_id()
         
         if kd_code_settings is None:
             from kd_core.config import (
@@ -115,27 +385,32 @@ class CollaborativeEditor:
                 'max_chars': DEFAULT_MAX_CHARS
             }
         
+        now = time.time()
         owner = User(
             user_id=owner_id,
             username=f"User_{owner_id[:8]}",
             color=self._generate_user_color(owner_id),
-            join_time=time.time()
+            join_time=now
         )
         
         document = CollaborativeDocument(
             doc_id=doc_id,
             title=title,
-            content=initial_content,
-            created_at=time.time(),
-            last_modified=time.time(),
+            buffer=TextBuffer(initial_content),
+            created_at=now,
+            last_modified=now,
             owner_id=owner_id,
-            participants=[owner],
-            operations_log=[],
-            kd_code_settings=kd_code_settings
+            participants={owner_id: owner},
+            operations_log=deque(maxlen=_OPERATIONS_LOG_LIMIT),
+            kd_code_settings=kd_code_settings,
+            snapshot_content=initial_content
         )
         
         self.documents[doc_id] = document
-        self.locks[doc_id] = asyncio.Lock()
+        self.document_sessions[doc_id] = {owner_id}
+        self.user_docs.setdefault(owner_id, set()).add(doc_id)
+        self.doc_queues[doc_id] = asyncio.Queue()
+        self.doc_workers[doc_id] = asyncio.create_task(self._doc_worker(doc_id))
         
         return doc_id
     
@@ -154,34 +429,33 @@ class CollaborativeEditor:
         if doc_id not in self.documents:
             return False
         
-        async with self.locks[doc_id]:
+        async with self._lock(doc_id):
             # Check if user is already in the document
-            for participant in self.documents[doc_id].participants:
-                if participant.user_id == user_id:
-                    return True  # Already joined
+            if user_id in self.documents[doc_id].participants:
+                return True  # Already joined
             
             # Add user to participants
+            now = time.time()
             user = User(
                 user_id=user_id,
                 username=username or f"User_{user_id[:8]}",
                 color=self._generate_user_color(user_id),
-                join_time=time.time()
+                join_time=now
             )
             
-            self.documents[doc_id].participants.append(user)
+            self.documents[doc_id].participants[user_id] = user
             
             # Add to document session
-            if doc_id not in self.document_sessions:
-                self.document_sessions[doc_id] = []
-            self.document_sessions[doc_id].append(user_id)
+            self.document_sessions.setdefault(doc_id, set()).add(user_id)
+            self.user_docs.setdefault(user_id, set()).add(doc_id)
             
             # Broadcast join event
             await self.broadcast_to_document(
                 doc_id,
                 {
                     'type': OperationType.JOIN.value,
-                    'user': asdict(user),
-                    'timestamp': time.time()
+                    'user': user.to_dict(),
+                    'timestamp': now
                 }
             )
             
@@ -198,19 +472,19 @@ class CollaborativeEditor:
         if doc_id not in self.documents:
             return
         
-        async with self.locks[doc_id]:
+        async with self._lock(doc_id):
             # Remove user from participants
-            self.documents[doc_id].participants = [
-                u for u in self.documents[doc_id].participants 
-                if u.user_id != user_id
-            ]
+            self.documents[doc_id].participants.pop(user_id, None)
             
             # Remove from document session
             if doc_id in self.document_sessions:
-                self.document_sessions[doc_id] = [
-                    uid for uid in self.document_sessions[doc_id] 
-                    if uid != user_id
-                ]
+                self.document_sessions[doc_id].discard(user_id)
+            
+            user_docs = self.user_docs.get(user_id)
+            if user_docs is not None:
+                user_docs.discard(doc_id)
+                if not user_docs:
+                    del self.user_docs[user_id]
             
             # Broadcast leave event
             await self.broadcast_to_document(
@@ -222,59 +496,119 @@ class CollaborativeEditor:
                 }
             )
     
-    async def apply_operation(self, doc_id: str, operation: Operation):
+    async def apply_operation(self, doc_id: str, operation: Operation) -> bool:
         """
         Apply an operation to a document with operational transformation
         
+        The operation is queued for the document's worker task, which applies
+        operations one at a time in arrival order and broadcasts them.
+        
         Args:
             doc_id: Document ID
             operation: Operation to apply
+        
+        Returns:
+            True if applied, False if the document doesn't exist or the operation's
+            base revision has already been evicted from the operations log
         """
         if doc_id not in self.documents:
-            return
+            return False
         
-        async with self.locks[doc_id]:
-            # Update document based on operation type
-            doc = self.documents[doc_id]
-            doc.last_modified = time.time()
-            
-            if operation.operation_type == OperationType.INSERT:
-                if operation.position is not None and operation.text is not None:
-                    doc.content = (
-                        doc.content[:operation.position] + 
-                        operation.text + 
-                        doc.content[operation.position:]
+        applied = asyncio.get_running_loop().create_future()
+        self.doc_queues[doc_id].put_nowait((operation, applied))
+        return await applied
+    
+    async def _doc_worker(self, doc_id: str):
+        """
+        Drain a document's operation queue
+        
+        Only this task mutates the document's text, so edits need no lock and
+        other documents' edits never wait behind this one.
+        
+        Args:
+            doc_id: Document ID
+        """
+        doc = self.documents[doc_id]
+        queue = self.doc_queues[doc_id]
+        
+        while True:
+            operation, applied = await queue.get()
+            try:
+                operation = self._apply_to_document(doc, operation)
+                if operation is not None:
+                    # Clients order operations by revision
+                    await self.broadcast_to_document(
+                        doc_id,
+                        {
+                            'type': operation.operation_type.value,
+                            'operation': operation.to_dict(),
+                            'timestamp': operation.timestamp
+                        }
                     )
+            except Exception as e:
+                if not applied.done():
+                    applied.set_exception(e)
+                continue
             
-            elif operation.operation_type == OperationType.DELETE:
-                if operation.position is not None and operation.text is not None:
-                    # Find the text to delete and remove it
-                    start_pos = operation.position
-                    end_pos = start_pos + len(operation.text)
-                    doc.content = doc.content[:start_pos] + doc.content[end_pos:]
-            
-            elif operation.operation_type == OperationType.UPDATE:
-                # For updating KD-Code settings
-                if operation.text:
-                    try:
-                        settings_update = json.loads(operation.text)
-                        doc.kd_code_settings.update(settings_update)
-                    except json.JSONDecodeError:
-                        pass  # Ignore invalid settings updates
-            
-            # Add operation to log
-            operation.timestamp = time.time()
-            doc.operations_log.append(operation)
-            
-            # Broadcast operation to all connected users
-            await self.broadcast_to_document(
-                doc_id,
-                {
-                    'type': operation.operation_type.value,
-                    'operation': operation.to_dict(),
-                    'timestamp': time.time()
-                }
-            )
+            if not applied.done():
+                applied.set_result(operation is not None)
+    
+    def _apply_to_document(self, doc: CollaborativeDocument, operation: Operation) -> Optional[Operation]:
+        """
+        Rebase an operation over the log, apply it and record it
+        
+        Args:
+            doc: Document to modify
+            operation: Operation to apply
+        
+        Returns:
+            The operation as applied, or None if its base revision was evicted
+        """
+        # Rebase the operation over everything applied since the client's revision
+        if operation.base_revision is not None:
+            first_logged = doc.revision - len(doc.operations_log)
+            if operation.base_revision < first_logged:
+                return None
+            for applied in islice(doc.operations_log, operation.base_revision - first_logged, None):
+                operation = transform(operation, applied)
+        
+        # One clock read stamps both the document and the operation
+        now = time.time()
+        doc.last_modified = now
+        
+        # Update document based on operation type
+        
+        if operation.operation_type == OperationType.INSERT:
+            if operation.position is not None and operation.text is not None:
+                doc.buffer.insert(operation.position, operation.text)
+        
+        elif operation.operation_type == OperationType.DELETE:
+            if operation.position is not None and operation.text is not None:
+                doc.buffer.delete(operation.position, len(operation.text))
+        
+        elif operation.operation_type == OperationType.UPDATE:
+            # For updating KD-Code settings; clients send the changes as a
+            # parsed settings_delta, or as a JSON string in text
+            if isinstance(operation.settings_delta, dict):
+                doc.kd_code_settings.update(operation.settings_delta)
+            elif operation.text:
+                try:
+                    settings_update = orjson.loads(operation.text)
+                    doc.kd_code_settings.update(settings_update)
+                except orjson.JSONDecodeError:
+                    pass  # Ignore invalid settings updates
+        
+        # Add operation to log
+        doc.revision += 1
+        operation.revision = doc.revision
+        operation.timestamp = now
+        doc.operations_log.append(operation)
+        
+        if doc.revision % _SNAPSHOT_INTERVAL == 0:
+            doc.snapshot_revision = doc.revision
+            doc.snapshot_content = doc.content
+        
+        return operation
     
     async def broadcast_to_document(self, doc_id: str, message: Dict[str, Any]):
         """
@@ -284,19 +618,20 @@ class CollaborativeEditor:
             doc_id: Document ID
             message: Message to broadcast
         """
+        self._broadcast_now(doc_id, message)
+    
+    def _broadcast_now(self, doc_id: str, message: Dict[str, Any]):
+        """Broadcast synchronously; usable from event loop callbacks"""
         if doc_id not in self.document_sessions:
             return
         
-        message_json = json.dumps(message)
-        
-        # Send to all connected users in this document
-        for user_id in self.document_sessions[doc_id]:
-            if user_id in self.connections:
-                try:
-                    await self.connections[user_id].send(message_json)
-                except websockets.exceptions.ConnectionClosed:
-                    # Remove disconnected user
-                    del self.connections[user_id]
+        # Serialize once; websockets frames the shared payload a single time for
+        # every open connection, skips closed ones and never blocks on a slow peer
+        connections = self.connections
+        websockets.broadcast(
+            [connections[user_id] for user_id in self.document_sessions[doc_id] if user_id in connections],
+            orjson.dumps(message).decode()
+        )
     
     async def get_document_state(self, doc_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -319,9 +654,10 @@ class CollaborativeEditor:
             'created_at': doc.created_at,
             'last_modified': doc.last_modified,
             'owner_id': doc.owner_id,
-            'participants': [asdict(user) for user in doc.participants],
+            'participants': [user.to_dict() for user in doc.participants.values()],
             'kd_code_settings': doc.kd_code_settings,
-            'operation_count': len(doc.operations_log)
+            'operation_count': doc.revision,
+            'revision': doc.revision
         }
     
     def _generate_user_color(self, user_id: str) -> str:
@@ -334,9 +670,7 @@ class CollaborativeEditor:
         Returns:
             Hex color string
         """
-        # Use the first few characters of the user ID to generate a color
-        hash_val = hash(user_id) % 0xFFFFFF
-        return f"#{hash_val:06x}"
+        return _user_color(user_id)
     
     async def send_chat_message(self, doc_id: str, user_id: str, message: str):
         """
@@ -366,16 +700,38 @@ class CollaborativeEditor:
             user_id: User ID
             start: Selection start position
             end: Selection end position
+        
+        Cursor moves arrive many times a second, so selections are debounced:
+        only each user's latest selection within the window is broadcast.
         """
-        await self.broadcast_to_document(
-            doc_id,
-            {
-                'type': OperationType.SELECTION.value,
-                'user_id': user_id,
-                'selection': {'start': start, 'end': end},
-                'timestamp': time.time()
-            }
-        )
+        pending = self.pending_selections.get(doc_id)
+        if pending is None:
+            pending = self.pending_selections[doc_id] = {}
+            asyncio.get_running_loop().call_later(_SELECTION_DEBOUNCE, self._flush_selections, doc_id)
+        pending[user_id] = (start, end)
+    
+    def _flush_selections(self, doc_id: str):
+        """
+        Broadcast the selections collected for a document during the debounce window
+        
+        Args:
+            doc_id: Document ID
+        """
+        pending = self.pending_selections.pop(doc_id, None)
+        if not pending:
+            return
+        
+        now = time.time()
+        for user_id, (start, end) in pending.items():
+            self._broadcast_now(
+                doc_id,
+                {
+                    'type': OperationType.SELECTION.value,
+                    'user_id': user_id,
+                    'selection': {'start': start, 'end': end},
+                    'timestamp': now
+                }
+            )
 
 
 # Global collaborative editor instance
@@ -392,26 +748,36 @@ class CollaborationServer:
         self.port = port
         self.editor = collab_editor
         self.websocket_server = None
+        
+        # Message type -> handler
+        self._handlers = {
+            'create_doc': self._handle_create_doc,
+            'join_doc': self._handle_join_doc,
+            'leave_doc': self._handle_leave_doc,
+            'operation': self._handle_operation,
+            'chat': self._handle_chat,
+            'selection': self._handle_selection
+        }
     
-    async def handle_connection(self, websocket: websockets.WebSocketServerProtocol, path: str):
+    async def handle_connection(self, websocket: websockets.ServerConnection, path: Optional[str] = None):
         """
         Handle a new WebSocket connection
         
         Args:
             websocket: WebSocket connection
-            path: Connection path
+            path: Connection path (only passed by legacy websockets servers)
         """
-        user_id = str(uuid.uuid4())
+        user_id = _new_id()
         self.editor.connections[user_id] = websocket
         
         try:
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    data = orjson.loads(message)
                     await self.handle_message(user_id, data)
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     # Send error message to client
-                    await websocket.send(json.dumps({
+                    await websocket.send(_dumps({
                         'type': 'error',
                         'message': 'Invalid JSON message'
                     }))
@@ -423,9 +789,8 @@ class CollaborationServer:
                 del self.editor.connections[user_id]
             
             # Remove user from any documents they were in
-            for doc_id, session_users in self.editor.document_sessions.items():
-                if user_id in session_users:
-                    await self.editor.leave_document(doc_id, user_id)
+            for doc_id in list(self.editor.user_docs.get(user_id, ())):
+                await self.editor.leave_document(doc_id, user_id)
     
     async def handle_message(self, user_id: str, data: Dict[str, Any]):
         """
@@ -435,78 +800,95 @@ class CollaborationServer:
             user_id: User ID of the sender
             data: Message data
         """
-        msg_type = data.get('type')
+        if not isinstance(data, dict):
+            return
         
-        if msg_type == 'create_doc':
-            title = data.get('title', 'Untitled')
-            content = data.get('content', '')
-            settings = data.get('settings')
-            
-            doc_id = await self.editor.create_document(title, user_id, content, settings)
-            
-            await self.editor.connections[user_id].send(json.dumps({
-                'type': 'doc_created',
-                'doc_id': doc_id
-            }))
-        
-        elif msg_type == 'join_doc':
-            doc_id = data.get('doc_id')
-            username = data.get('username')
-            
-            success = await self.editor.join_document(doc_id, user_id, username)
-            
-            if success:
-                # Send document state to new user
-                state = await self.editor.get_document_state(doc_id)
-                if state:
-                    await self.editor.connections[user_id].send(json.dumps({
-                        'type': 'doc_joined',
-                        'state': state
-                    }))
+        handler = self._handlers.get(data.get('type'))
+        if handler is not None:
+            await handler(user_id, data)
+    
+    async def _handle_create_doc(self, user_id: str, data: Dict[str, Any]):
+        """Create a document owned by the sender"""
+        title = data.get('title', 'Untitled')
+        content = data.get('content', '')
+        settings = data.get('settings')
         
-        elif msg_type == 'leave_doc':
-            doc_id = data.get('doc_id')
-            await self.editor.leave_document(doc_id, user_id)
+        doc_id = await self.editor.create_document(title, user_id, content, settings)
         
-        elif msg_type == 'operation':
-            doc_id = data.get('doc_id')
-            op_data = data.get('operation')
-            
-            if doc_id and op_data:
-                try:
-                    operation = Operation(
-                        op_id=op_data['op_id'],
-                        user_id=user_id,
-                        operation_type=OperationType(op_data['operation_type']),
-                        position=op_data.get('position'),
-                        text=op_data.get('text')
-                    )
-                    
-                    await self.editor.apply_operation(doc_id, operation)
-                except (KeyError, ValueError):
-                    await self.editor.connections[user_id].send(json.dumps({
+        await self.editor.connections[user_id].send(_dumps({
+            'type': 'doc_created',
+            'doc_id': doc_id
+        }))
+    
+    async def _handle_join_doc(self, user_id: str, data: Dict[str, Any]):
+        """Join a document and send its state to the sender"""
+        doc_id = data.get('doc_id')
+        username = data.get('username')
+        
+        success = await self.editor.join_document(doc_id, user_id, username)
+        
+        if success:
+            # Send document state to new user
+            state = await self.editor.get_document_state(doc_id)
+            if state:
+                await self.editor.connections[user_id].send(_dumps({
+                    'type': 'doc_joined',
+                    'state': state
+                }))
+    
+    async def _handle_leave_doc(self, user_id: str, data: Dict[str, Any]):
+        """Leave a document"""
+        doc_id = data.get('doc_id')
+        await self.editor.leave_document(doc_id, user_id)
+    
+    async def _handle_operation(self, user_id: str, data: Dict[str, Any]):
+        """Apply an edit or settings operation"""
+        doc_id = data.get('doc_id')
+        op_data = data.get('operation')
+        
+        if doc_id and op_data:
+            try:
+                operation = Operation(
+                    op_id=op_data['op_id'],
+                    user_id=user_id,
+                    operation_type=_OPTYPE_BY_VALUE[op_data['operation_type']],
+                    position=op_data.get('position'),
+                    text=op_data.get('text'),
+                    base_revision=op_data.get('base_revision'),
+                    settings_delta=op_data.get('settings_delta')
+                )
+                
+                if not await self.editor.apply_operation(doc_id, operation):
+                    await self.editor.connections[user_id].send(_dumps({
                         'type': 'error',
-                        'message': 'Invalid operation data'
+                        'message': 'Operation could not be applied; rejoin the document to resync'
                     }))
+            except (KeyError, ValueError):
+                await self.editor.connections[user_id].send(_dumps({
+                    'type': 'error',
+                    'message': 'Invalid operation data'
+                }))
+    
+    async def _handle_chat(self, user_id: str, data: Dict[str, Any]):
+        """Relay a chat message to the document"""
+        doc_id = data.get('doc_id')
+        message = data.get('message')
         
-        elif msg_type == 'chat':
-            doc_id = data.get('doc_id')
-            message = data.get('message')
-            
-            if doc_id and message:
-                await self.editor.send_chat_message(doc_id, user_id, message)
-        
-        elif msg_type == 'selection':
-            doc_id = data.get('doc_id')
-            selection = data.get('selection', {})
-            start = selection.get('start', 0)
-            end = selection.get('end', 0)
-            
-            if doc_id:
-                await self.editor.update_user_selection(doc_id, user_id, start, end)
+        if doc_id and message:
+            await self.editor.send_chat_message(doc_id, user_id, message)
     
-    async def start_server(self):
-        """Start the WebSocket server"""
+    async def _handle_selection(self, user_id: str, data: Dict[str, Any]):
+        """Record the sender's text selection"""
+        doc_id = data.get('doc_id')
+        selection = data.get('selection', {})
+        start = selection.get('start', 0)
+        end = selection.get('end', 0)
+        
+        if doc_id:
+            await self.editor.update_user_selection(doc_id, user_id, start, end)
+    
+    async def serve_forever(self):
+        """Serve WebSocket connections on the running event loop until cancelled"""
         self.websocket_server = await websockets.serve(
             self.handle_connection,
             self.host,
@@ -514,17 +896,27 @@ class CollaborationServer:
         )
         print(f"Collaboration server started on {self.host}:{self.port}")
         
-        # Keep the server running
-        await self.websocket_server.wait_closed()
+        # Keep the server running; close the listener if the task is cancelled
+        try:
+            await self.websocket_server.wait_closed()
+        finally:
+            self.websocket_server.close()
     
-    def run_server(self):
-        """Run the server in a separate thread"""
-        def run():
-            asyncio.run(self.start_server())
+    def start_background(self) -> asyncio.Task:
+        """
+        Serve alongside the caller's code on the current event loop
         
-        server_thread = Thread(target=run, daemon=True)
-        server_thread.start()
-        return server_thread
+        Returns:
+            Task running serve_forever(); cancel it to stop the server
+        """
+        return asyncio.get_running_loop().create_task(self.serve_forever())
+    
+    def run_server(self):
+        """Run the server in the calling thread until it stops, on uvloop when it is installed"""
+        if UVLOOP_AVAILABLE:
+            uvloop.run(self.serve_forever())
+        else:
+            asyncio.run(self.serve_forever())
 
 
 # Functions for integration with the main application
@@ -559,7 +951,9 @@ async def join_collaborative_session(session_id: str, user_id: str, username: st
 
 
 async def send_operation_to_session(session_id: str, user_id: str, operation_type: str, 
-                                  position: int = None, text: str = None):
+                                  position: int = None, text: str = None,
+                                  base_revision: int = None,
+                                  settings_delta: Dict[str, Any] = None):
     """
     Send an operation to a collaborative session
     
@@ -569,13 +963,21 @@ async def send_operation_to_session(session_id: str, user_id: str, operation_typ
         operation_type: Type of operation ('insert', 'delete', 'update')
         position: Position for the operation
         text: Text for the operation
+        base_revision: Document revision the operation was made against
+        settings_delta: KD-Code settings changes for an 'update' operation
     """
+    op_type = _OPTYPE_BY_VALUE.get(operation_type)
+    if op_type is None:
+        raise ValueError(f"{operation_type!r} is not a valid OperationType")
+    
     operation = Operation(
-        op_id=str(uuid.uuid4()),
+        op_id=_new_id(),
         user_id=user_id,
-        operation_type=OperationType(operation_type),
+        operation_type=op_type,
         position=position,
-        text=text
+        text=text,
+        base_revision=base_revision,
+        settings_delta=settings_delta
     )
     
     await collab_editor.apply_operation(session_id, operation)
@@ -5,18 +5,135 @@ Enables multiple users to scan the same KD-Code simultaneously and share results
 
 import asyncio
 import websockets
-import json
+import orjson
 import uuid
+import secrets
 import time
-from typing import Dict, List, Optional, Set
+from typing import Deque, Dict, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
-from threading import Thread
+from threading import Lock, Thread
 import base64
+import binascii
+import io
+import zlib
+from collections import defaultdict, deque
+from itertools import islice
+import numpy as np
+from PIL import Image
 from kd_core.decoder import decode_kd_code
-from kd_core.config import (
-    DEFAULT_SCAN_SEGMENTS_PER_RING, DEFAULT_MIN_ANCHOR_RADIUS, DEFAULT_MAX_ANCHOR_RADIUS
-)
+from kd_core._scan_kernels import score_rings, warm_up as _warm_up_kernels
+from kd_core.config import SCAN_DEFAULTS
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+
+# Seconds a participant gets to accept a broadcast before being dropped
+_SEND_TIMEOUT = 5.0
+
+# Serialized events at least this large are deflated once per broadcast and sent
+# as binary frames: _DEFLATED_PREFIX followed by raw deflate data (e.g. pako.inflateRaw)
+_COMPRESS_THRESHOLD = 256
+_DEFLATED_PREFIX = b'\x01'
+
+# Results kept per session; older ones are dropped
+_MAX_STORED_RESULTS = 200
+
+# Bounding box of the JPEG preview stored with each result
+_PREVIEW_SIZE = (64, 64)
+
+# Longest side of the grayscale copy used to score a frame
+_SCORE_SIZE = 256
+
+# Data rings sampled when scoring, spread between these fractions of the
+# frame's half-size; codes are expected roughly centered, as in decode_kd_code
+_SCORE_RINGS = 10
+_SCORE_INNER = 0.15
+_SCORE_OUTER = 0.85
+
+# Confidence reported for frames that did not decode, whatever their contrast
+_UNDECODED_CONFIDENCE = 0.1
+
+# Largest inbound WebSocket message, sized for base64 camera frames
+_MAX_FRAME_SIZE = 4 * 1024 * 1024
+
+# Events a connection may have waiting; a client that falls this far behind is disconnected
+_OUTBOX_LIMIT = 64
+
+# Seconds a relay waits after the first queued event so later ones share its frame
+_BATCH_TICK = 0.01
+
+
+def _encode_event(message: Dict[str, any]) -> bytes:
+    """
+    Serialize an event for the outboxes
+    
+    Small events stay plain JSON for text frames; large ones are compressed
+    here, once, rather than by per-connection permessage-deflate for every
+    recipient of the same broadcast.
+    """
+    return _frame_payload(orjson.dumps(message))
+
+
+def _frame_payload(payload: bytes) -> bytes:
+    """Deflate already-serialized JSON for the outboxes if it is large enough"""
+    if len(payload) < _COMPRESS_THRESHOLD:
+        return payload
+    compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return _DEFLATED_PREFIX + compressor.compress(payload) + compressor.flush()
+
+
+def _make_preview(image_bytes: bytes) -> Optional[str]:
+    """
+    Build a small JPEG data URI preview of a scanned frame
+    
+    Only this thumbnail is kept with the result, instead of a slice of the
+    frame's base64 text, which was not a usable image anyway.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            # Lets JPEG frames decode at reduced scale instead of full size
+            img.draft('RGB', _PREVIEW_SIZE)
+            img = img.convert('RGB')
+            img.thumbnail(_PREVIEW_SIZE)
+            buffer = io.BytesIO()
+            img.save(buffer, format='JPEG', quality=70)
+    except (OSError, ValueError):
+        return None
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def _score_frame(image_bytes: bytes, segments_per_ring: int) -> float:
+    """
+    Estimate how cleanly a frame's data rings read, from 0 to 1
+    
+    The frame is reduced to a small grayscale copy and its rings are sampled
+    around the frame center by score_rings.
+    """
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            img.draft('L', (_SCORE_SIZE, _SCORE_SIZE))
+            img = img.convert('L')
+            img.thumbnail((_SCORE_SIZE, _SCORE_SIZE))
+            gray = np.asarray(img)
+    except (OSError, ValueError):
+        return 0.0
+    
+    h, w = gray.shape
+    half = min(h, w) / 2
+    ring_width = half * (_SCORE_OUTER - _SCORE_INNER) / _SCORE_RINGS
+    confidence, _ = score_rings(gray, w / 2, h / 2, half * _SCORE_INNER, ring_width,
+                                _SCORE_RINGS, segments_per_ring)
+    return confidence
+
+
+def _resolve_settings(settings: Dict[str, any]) -> Tuple[int, int, int]:
+    """Return (segments_per_ring, min_anchor_radius, max_anchor_radius), filling gaps from SCAN_DEFAULTS"""
+    return tuple(settings.get(name, default) for name, default in SCAN_DEFAULTS.items())
 
 
 class ScanEventType(Enum):
@@ -34,16 +151,19 @@ class ScanEventType(Enum):
 @dataclass
 class ScanParticipant:
     """Represents a participant in a collaborative scan session"""
+    __slots__ = ('user_id', 'username', 'join_time', 'is_scanning', 'last_activity')
     user_id: str
     username: str
     join_time: float
-    is_scanning: bool = False
-    last_activity: float = 0.0
+    is_scanning: bool
+    last_activity: float
 
 
 @dataclass
 class ScanResult:
     """Represents a scan result in collaborative scanning"""
+    __slots__ = ('result_id', 'user_id', 'timestamp', 'decoded_text', 'confidence', 'processing_time',
+                 'image_preview')
     result_id: str
     user_id: str
     timestamp: float
@@ -56,13 +176,18 @@ class ScanResult:
 @dataclass
 class CollaborativeScanSession:
     """Represents a collaborative scanning session"""
+    __slots__ = ('session_id', 'created_at', 'owner_id', 'participants', 'scan_results', 'settings',
+                 'resolved_settings', 'is_active', 'shared_canvas', 'result_count')
     session_id: str
     created_at: float
-    participants: List[ScanParticipant]
-    scan_results: List[ScanResult]
+    owner_id: str
+    participants: Dict[str, ScanParticipant]  # user_id -> participant, in join order
+    scan_results: Deque[ScanResult]  # Most recent results, oldest evicted first
     settings: Dict[str, any]
+    resolved_settings: Tuple[int, int, int]  # Decoder arguments from settings, refreshed on every update
     is_active: bool
-    shared_canvas: Optional[Dict] = None  # For AR overlay sharing
+    shared_canvas: Optional[Dict]  # For AR overlay sharing
+    result_count: int  # Results produced over the session's lifetime
 
 
 class CollaborativeScanner:
@@ -72,9 +197,14 @@ class CollaborativeScanner:
     
     def __init__(self):
         self.sessions: Dict[str, CollaborativeScanSession] = {}
-        self.connections: Dict[str, websockets.WebSocketServerProtocol] = {}  # user_id -> websocket
+        self.connections: Dict[str, websockets.ServerConnection] = {}  # user_id -> websocket
+        self.outboxes: Dict[str, asyncio.Queue] = {}  # user_id -> events waiting to be sent
+        self.relays: Dict[str, asyncio.Task] = {}  # user_id -> task draining the outbox
         self.session_participants: Dict[str, Set[str]] = {}  # session_id -> set of user_ids
         self.scan_locks: Dict[str, asyncio.Lock] = {}  # session_id -> lock
+        self._state_version: Dict[str, int] = {}  # session_id -> bumped on every state change
+        self._state_cache: Dict[str, Tuple[int, Dict[str, any], bytes]] = {}  # session_id -> (version, state, JSON)
+        self._result_seq: Dict[str, int] = defaultdict(int)  # session_id -> next result sequence number
     
     async def create_session(self, creator_id: str, session_name: str = "Collaborative Scan", 
                            scan_settings: Dict[str, any] = None) -> str:
@@ -93,9 +223,7 @@ class CollaborativeScanner:
         
         if scan_settings is None:
             scan_settings = {
-                'segments_per_ring': DEFAULT_SCAN_SEGMENTS_PER_RING,
-                'min_anchor_radius': DEFAULT_MIN_ANCHOR_RADIUS,
-                'max_anchor_radius': DEFAULT_MAX_ANCHOR_RADIUS,
+                **SCAN_DEFAULTS,
                 'enable_multithreading': True,
                 'detection_sensitivity': 'medium'
             }
@@ -111,15 +239,20 @@ class CollaborativeScanner:
         session = CollaborativeScanSession(
             session_id=session_id,
             created_at=time.time(),
-            participants=[creator],
-            scan_results=[],
+            owner_id=creator_id,
+            participants={creator_id: creator},
+            scan_results=deque(maxlen=_MAX_STORED_RESULTS),
             settings=scan_settings,
-            is_active=True
+            resolved_settings=_resolve_settings(scan_settings),
+            is_active=True,
+            shared_canvas=None,
+            result_count=0
         )
         
         self.sessions[session_id] = session
         self.session_participants[session_id] = {creator_id}
         self.scan_locks[session_id] = asyncio.Lock()
+        self._state_version[session_id] = 0
         
         return session_id
     
@@ -135,25 +268,27 @@ class CollaborativeScanner:
         Returns:
             True if successful, False otherwise
         """
-        if session_id not in self.sessions or not self.sessions[session_id].is_active:
+        session = self.sessions.get(session_id)
+        if session is None or not session.is_active:
             return False
         
         async with self.scan_locks[session_id]:
             # Check if user is already in the session
-            for participant in self.sessions[session_id].participants:
-                if participant.user_id == user_id:
-                    return True  # Already joined
+            if user_id in session.participants:
+                return True  # Already joined
             
             # Add user to participants
             user = ScanParticipant(
                 user_id=user_id,
                 username=username or f"User_{user_id[:8]}",
                 join_time=time.time(),
+                is_scanning=False,
                 last_activity=time.time()
             )
             
-            self.sessions[session_id].participants.append(user)
+            session.participants[user_id] = user
             self.session_participants[session_id].add(user_id)
+            self._invalidate_state(session_id)
             
             # Notify all participants about the new user
             await self.broadcast_to_session(
@@ -169,13 +304,8 @@ class CollaborativeScanner:
                 }
             )
             
-            # Send session state to new user
-            if user_id in self.connections:
-                session_state = await self.get_session_state(session_id)
-                await self.connections[user_id].send(json.dumps({
-                    'type': 'session_state',
-                    'state': session_state
-                }))
+            # Send session state to new user, spliced from the cached JSON
+            self.send_state_to_user(session_id, user_id, 'session_state')
             
             return True
     
@@ -187,23 +317,22 @@ class CollaborativeScanner:
             session_id: Session ID to leave
             user_id: User ID leaving
         """
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             return
         
         async with self.scan_locks[session_id]:
             # Remove user from participants
-            self.sessions[session_id].participants = [
-                p for p in self.sessions[session_id].participants 
-                if p.user_id != user_id
-            ]
+            session.participants.pop(user_id, None)
             
             # Remove from session participants set
             if session_id in self.session_participants:
                 self.session_participants[session_id].discard(user_id)
             
             # If no participants left, deactivate session
-            if not self.sessions[session_id].participants:
-                self.sessions[session_id].is_active = False
+            if not session.participants:
+                session.is_active = False
+            self._invalidate_state(session_id)
             
             # Notify remaining participants
             await self.broadcast_to_session(
@@ -224,45 +353,50 @@ class CollaborativeScanner:
             user_id: User ID submitting the frame
             frame_data: Base64 encoded image frame data
         """
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             return
         
         start_time = time.time()
         
         try:
-            # Decode the frame data
+            # Decode the frame data; for data URIs the base64 payload is read
+            # through a memoryview past the comma instead of split off as a copy
+            encoded = memoryview(frame_data.encode('ascii'))
             if frame_data.startswith('data:image'):
-                header, encoded = frame_data.split(',', 1)
-                image_bytes = base64.b64decode(encoded)
-            else:
-                image_bytes = base64.b64decode(frame_data)
+                encoded = encoded[frame_data.index(',') + 1:]
+            image_bytes = binascii.a2b_base64(encoded)
             
             # Decode the KD-Code using the session settings
-            session_settings = self.sessions[session_id].settings
-            decoded_text = decode_kd_code(
-                image_bytes,
-                segments_per_ring=session_settings.get('segments_per_ring', DEFAULT_SCAN_SEGMENTS_PER_RING),
-                min_anchor_radius=session_settings.get('min_anchor_radius', DEFAULT_MIN_ANCHOR_RADIUS),
-                max_anchor_radius=session_settings.get('max_anchor_radius', DEFAULT_MAX_ANCHOR_RADIUS)
-            )
+            segments_per_ring, min_anchor_radius, max_anchor_radius = session.resolved_settings
+            decoded_text = decode_kd_code(image_bytes, segments_per_ring, min_anchor_radius, max_anchor_radius)
             
+            confidence = _score_frame(image_bytes, segments_per_ring)
+            if not decoded_text:
+                confidence = min(confidence, _UNDECODED_CONFIDENCE)
             processing_time = time.time() - start_time
-            confidence = 0.9 if decoded_text else 0.1  # Simplified confidence calculation
+            
+            # Result IDs are "<session prefix>-<seq>": unique per session and
+            # sortable, without drawing on the OS entropy pool for every frame
+            seq = self._result_seq[session_id]
+            self._result_seq[session_id] = seq + 1
             
             # Create scan result
             result = ScanResult(
-                result_id=str(uuid.uuid4()),
+                result_id=f"{session_id[:8]}-{seq}",
                 user_id=user_id,
                 timestamp=time.time(),
                 decoded_text=decoded_text,
                 confidence=confidence,
                 processing_time=processing_time,
-                image_preview=frame_data[:100] + "..." if len(frame_data) > 100 else frame_data  # Truncate for storage
+                image_preview=_make_preview(image_bytes)
             )
             
-            # Add to session results
-            async with self.scan_locks[session_id]:
-                self.sessions[session_id].scan_results.append(result)
+            # Add to session results; nothing here awaits, so no other coroutine
+            # can observe the session between these updates and no lock is needed
+            session.scan_results.append(result)
+            session.result_count += 1
+            self._invalidate_state(session_id)
             
             # Prepare result message
             result_msg = {
@@ -293,8 +427,7 @@ class CollaborativeScanner:
                 'timestamp': time.time()
             }
             
-            if user_id in self.connections:
-                await self.connections[user_id].send(json.dumps(error_msg))
+            await self.send_to_user(user_id, error_msg)
     
     async def update_scan_settings(self, session_id: str, user_id: str, new_settings: Dict[str, any]):
         """
@@ -305,24 +438,26 @@ class CollaborativeScanner:
             user_id: User ID making the update (should be session owner)
             new_settings: New scan settings
         """
-        if session_id not in self.sessions:
+        session = self.sessions.get(session_id)
+        if session is None:
             return
         
         # Only allow session owner to update settings (simplified check)
-        session_owner = self.sessions[session_id].participants[0].user_id if self.sessions[session_id].participants else None
-        if user_id != session_owner:
+        if user_id != session.owner_id:
             # For now, allow anyone to update settings
             pass
         
         async with self.scan_locks[session_id]:
-            self.sessions[session_id].settings.update(new_settings)
+            session.settings.update(new_settings)
+            session.resolved_settings = _resolve_settings(session.settings)
+            self._invalidate_state(session_id)
         
         # Broadcast settings update to all participants
         await self.broadcast_to_session(
             session_id,
             {
                 'type': ScanEventType.SCAN_SETTINGS_UPDATE.value,
-                'settings': self.sessions[session_id].settings,
+                'settings': session.settings,
                 'updated_by': user_id,
                 'timestamp': time.time()
             }
@@ -339,33 +474,173 @@ class CollaborativeScanner:
         if session_id not in self.session_participants:
             return
         
-        message_json = json.dumps(message)
+        # Serialize once and queue the same bytes for each participant's relay
+        # task; nothing here waits on a socket, so a slow peer delays nobody else
+        payload = _encode_event(message)
+        outboxes = self.outboxes
+        for user_id in list(self.session_participants[session_id]):
+            outbox = outboxes.get(user_id)
+            if outbox is not None:
+                self._enqueue(user_id, outbox, payload)
+    
+    async def send_to_user(self, user_id: str, message: Dict[str, any]):
+        """
+        Queue a message for a single connected user
         
-        # Send to all connected users in this session
-        for user_id in self.session_participants[session_id]:
-            if user_id in self.connections:
-                try:
-                    await self.connections[user_id].send(message_json)
-                except websockets.exceptions.ConnectionClosed:
-                    # Remove disconnected user
-                    del self.connections[user_id]
-                    # Also remove from session
+        Args:
+            user_id: Recipient user ID
+            message: Message to send
+        """
+        outbox = self.outboxes.get(user_id)
+        if outbox is not None:
+            self._enqueue(user_id, outbox, _encode_event(message))
+    
+    def _enqueue(self, user_id: str, outbox: asyncio.Queue, payload: bytes):
+        """
+        Queue a serialized event without ever waiting on the recipient
+        
+        A client whose outbox is full is disconnected instead of stalling the
+        sender; closing the socket ends its handler, which cleans up its sessions.
+        """
+        try:
+            outbox.put_nowait(payload)
+        except asyncio.QueueFull:
+            websocket = self.connections.get(user_id)
+            self.unregister_connection(user_id)
+            if websocket is not None:
+                asyncio.ensure_future(websocket.close(1008, 'Client too slow'))
+    
+    def register_connection(self, user_id: str, websocket: websockets.ServerConnection):
+        """
+        Register a client connection and start its relay task
+        
+        Args:
+            user_id: User ID assigned to the connection
+            websocket: WebSocket connection
+        """
+        outbox = asyncio.Queue(maxsize=_OUTBOX_LIMIT)
+        self.connections[user_id] = websocket
+        self.outboxes[user_id] = outbox
+        self.relays[user_id] = asyncio.ensure_future(self._relay(user_id, websocket, outbox))
+    
+    def unregister_connection(self, user_id: str):
+        """
+        Forget a client connection and stop its relay task
+        
+        Args:
+            user_id: User ID of the connection
+        """
+        self.connections.pop(user_id, None)
+        self.outboxes.pop(user_id, None)
+        relay = self.relays.pop(user_id, None)
+        if relay is not None and relay is not asyncio.current_task():
+            relay.cancel()
+    
+    async def _send_events(self, websocket: websockets.ServerConnection, events: List[bytes]):
+        """Send serialized JSON events as one text frame, batching when there are several"""
+        if not events:
+            return
+        payload = events[0] if len(events) == 1 else b'{"type":"batch","events":[' + b','.join(events) + b']}'
+        await asyncio.wait_for(websocket.send(payload, text=True), _SEND_TIMEOUT)
+    
+    async def _relay(self, user_id: str, websocket: websockets.ServerConnection, outbox: asyncio.Queue):
+        """
+        Deliver one connection's queued events in order
+        
+        Events that pile up within one tick are merged into a single
+        {'type': 'batch', 'events': [...]} frame, so chatty sessions pay the
+        WebSocket/TCP/TLS framing cost once per tick instead of once per event.
+        
+        Args:
+            user_id: User ID of the connection
+            websocket: WebSocket connection
+            outbox: Queue of serialized events for this connection
+        """
+        try:
+            while True:
+                batch = [await outbox.get()]
+                await asyncio.sleep(_BATCH_TICK)
+                while not outbox.empty():
+                    batch.append(outbox.get_nowait())
+                
+                # Plain events are already JSON, so runs of them are spliced into
+                # one text frame; deflated events go out alone as binary frames
+                pending = []
+                for payload in batch:
+                    if payload.startswith(_DEFLATED_PREFIX):
+                        await self._send_events(websocket, pending)
+                        pending = []
+                        await asyncio.wait_for(websocket.send(payload), _SEND_TIMEOUT)
+                    else:
+                        pending.append(payload)
+                await self._send_events(websocket, pending)
+        except (websockets.exceptions.ConnectionClosed, asyncio.TimeoutError) as e:
+            # Remove disconnected or stalled user from the server and its sessions
+            self.unregister_connection(user_id)
+            if isinstance(e, asyncio.TimeoutError):
+                # A timed-out send may have been cut off mid-frame; close the
+                # connection so the client reconnects instead of waiting on it
+                asyncio.ensure_future(websocket.close(1011, 'Send timed out'))
+            for session_id, session_users in list(self.session_participants.items()):
+                if user_id in session_users:
                     await self.leave_session(session_id, user_id)
     
+    def send_state_to_user(self, session_id: str, user_id: str, message_type: str):
+        """
+        Queue a session's state for a user as {'type': message_type, 'state': ...}
+        
+        Args:
+            session_id: Session ID
+            user_id: Recipient user ID
+            message_type: Type of the envelope message
+        """
+        outbox = self.outboxes.get(user_id)
+        cached = self._cached_state(session_id)
+        if outbox is not None and cached is not None:
+            envelope = b'{"type":' + orjson.dumps(message_type) + b',"state":' + cached[2] + b'}'
+            self._enqueue(user_id, outbox, _frame_payload(envelope))
+    
+    def _invalidate_state(self, session_id: str):
+        """Mark a session's cached state as stale after a mutation"""
+        self._state_version[session_id] = self._state_version.get(session_id, 0) + 1
+    
+    def _cached_state(self, session_id: str) -> Optional[Tuple[int, Dict[str, any], bytes]]:
+        """
+        Return (version, state, serialized state) for a session
+        
+        The state is rebuilt only when its version has been bumped since it
+        was last built, so repeated queries and join-time pushes reuse it.
+        """
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        
+        version = self._state_version.get(session_id, 0)
+        cached = self._state_cache.get(session_id)
+        if cached is None or cached[0] != version:
+            state = self._build_session_state(session)
+            cached = (version, state, orjson.dumps(state))
+            self._state_cache[session_id] = cached
+        return cached
+    
     async def get_session_state(self, session_id: str) -> Optional[Dict[str, any]]:
         """
         Get the current state of a collaborative scanning session
         
+        The returned dict is cached and shared between callers; treat it as
+        read-only.
+        
         Args:
             session_id: Session ID
         
         Returns:
             Session state or None if session doesn't exist
         """
-        if session_id not in self.sessions:
-            return None
-        
-        session = self.sessions[session_id]
+        cached = self._cached_state(session_id)
+        return cached[1] if cached is not None else None
+    
+    def _build_session_state(self, session: CollaborativeScanSession) -> Dict[str, any]:
+        """Build the state dict for a session"""
         return {
             'session_id': session.session_id,
             'created_at': session.created_at,
@@ -377,11 +652,11 @@ class CollaborativeScanner:
                     'is_scanning': p.is_scanning,
                     'last_activity': p.last_activity
                 }
-                for p in session.participants
+                for p in session.participants.values()
             ],
-            'settings': session.settings,
+            'settings': dict(session.settings),
             'is_active': session.is_active,
-            'result_count': len(session.scan_results),
+            'result_count': session.result_count,
             'recent_results': [
                 {
                     'result_id': r.result_id,
@@ -391,7 +666,7 @@ class CollaborativeScanner:
                     'confidence': r.confidence,
                     'processing_time': r.processing_time
                 }
-                for r in session.scan_results[-5:]  # Last 5 results
+                for r in reversed(list(islice(reversed(session.scan_results), 5)))  # Last 5 results
             ]
         }
     
@@ -406,10 +681,10 @@ class CollaborativeScanner:
         Returns:
             Username or user ID if not found
         """
-        if session_id in self.sessions:
-            for participant in self.sessions[session_id].participants:
-                if participant.user_id == user_id:
-                    return participant.username
+        session = self.sessions.get(session_id)
+        participant = session.participants.get(user_id) if session is not None else None
+        if participant is not None:
+            return participant.username
         return user_id
 
 
@@ -423,35 +698,49 @@ class CollaborativeScanServer:
         self.port = port
         self.scanner = CollaborativeScanner()
         self.websocket_server = None
+        
+        # Message type -> handler
+        self._handlers = {
+            'create_session': self._handle_create_session,
+            'join_session': self._handle_join_session,
+            'submit_frame': self._handle_submit_frame,
+            'update_settings': self._handle_update_settings,
+            'send_chat': self._handle_send_chat
+        }
     
-    async def handle_connection(self, websocket: websockets.WebSocketServerProtocol, path: str):
+    async def handle_connection(self, websocket: websockets.ServerConnection, path: Optional[str] = None):
         """
         Handle a new WebSocket connection for collaborative scanning
         
+        Clients may send messages as text or binary JSON frames; binary is
+        preferred for submit_frame, whose base64 payloads are large.
+        
         Args:
             websocket: WebSocket connection
-            path: Connection path
+            path: Connection path (only passed by legacy websockets servers)
         """
-        user_id = str(uuid.uuid4())
-        self.scanner.connections[user_id] = websocket
+        user_id = secrets.token_hex(8)
+        self.scanner.register_connection(user_id, websocket)
         
         try:
-            async for message in websocket:
+            while True:
+                # Take every frame as raw bytes: orjson parses (and validates)
+                # UTF-8 itself, so text frames skip the decode to str
+                message = await websocket.recv(decode=False)
                 try:
-                    data = json.loads(message)
+                    data = orjson.loads(message)
                     await self.handle_message(user_id, data)
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     # Send error message to client
-                    await websocket.send(json.dumps({
+                    await self.scanner.send_to_user(user_id, {
                         'type': 'error',
                         'message': 'Invalid JSON message'
-                    }))
+                    })
         except websockets.exceptions.ConnectionClosed:
             pass
         finally:
             # Clean up connection
-            if user_id in self.scanner.connections:
-                del self.scanner.connections[user_id]
+            self.scanner.unregister_connection(user_id)
             
             # Remove user from any sessions they were in
             for session_id, session_users in self.scanner.session_participants.items():
@@ -466,72 +755,88 @@ class CollaborativeScanServer:
             user_id: User ID of the sender
             data: Message data
         """
-        msg_type = data.get('type')
+        if not isinstance(data, dict):
+            return
         
-        if msg_type == 'create_session':
-            session_name = data.get('session_name', 'Collaborative Scan')
-            settings = data.get('settings')
-            
-            session_id = await self.scanner.create_session(user_id, session_name, settings)
-            
-            await self.scanner.connections[user_id].send(json.dumps({
-                'type': 'session_created',
-                'session_id': session_id
-            }))
-        
-        elif msg_type == 'join_session':
-            session_id = data.get('session_id')
-            username = data.get('username')
-            
-            success = await self.scanner.join_session(session_id, user_id, username)
-            
-            if success:
-                session_state = await self.scanner.get_session_state(session_id)
-                await self.scanner.connections[user_id].send(json.dumps({
-                    'type': 'session_joined',
-                    'state': session_state
-                }))
-            else:
-                await self.scanner.connections[user_id].send(json.dumps({
-                    'type': 'error',
-                    'message': 'Could not join session'
-                }))
-        
-        elif msg_type == 'submit_frame':
-            session_id = data.get('session_id')
-            frame_data = data.get('frame_data')
-            
-            if session_id and frame_data:
-                await self.scanner.process_scan_frame(session_id, user_id, frame_data)
+        handler = self._handlers.get(data.get('type'))
+        if handler is not None:
+            await handler(user_id, data)
+    
+    async def _handle_create_session(self, user_id: str, data: Dict[str, any]):
+        """Create a session owned by the sender"""
+        session_name = data.get('session_name', 'Collaborative Scan')
+        settings = data.get('settings')
         
-        elif msg_type == 'update_settings':
-            session_id = data.get('session_id')
-            new_settings = data.get('settings', {})
-            
-            if session_id:
-                await self.scanner.update_scan_settings(session_id, user_id, new_settings)
+        session_id = await self.scanner.create_session(user_id, session_name, settings)
         
-        elif msg_type == 'send_chat':
-            session_id = data.get('session_id')
-            message = data.get('message')
-            
-            if session_id and message:
-                await self.scanner.broadcast_to_session(
-                    session_id,
-                    {
-                        'type': ScanEventType.CHAT_MESSAGE.value,
-                        'user_id': user_id,
-                        'message': message,
-                        'timestamp': time.time()
-                    }
-                )
+        await self.scanner.send_to_user(user_id, {
+            'type': 'session_created',
+            'session_id': session_id
+        })
+    
+    async def _handle_join_session(self, user_id: str, data: Dict[str, any]):
+        """Join a session and send its state to the sender"""
+        session_id = data.get('session_id')
+        username = data.get('username')
+        
+        success = await self.scanner.join_session(session_id, user_id, username)
+        
+        if success:
+            self.scanner.send_state_to_user(session_id, user_id, 'session_joined')
+        else:
+            await self.scanner.send_to_user(user_id, {
+                'type': 'error',
+                'message': 'Could not join session'
+            })
+    
+    async def _handle_submit_frame(self, user_id: str, data: Dict[str, any]):
+        """Process a camera frame for a session"""
+        session_id = data.get('session_id')
+        frame_data = data.get('frame_data')
+        
+        if session_id and frame_data:
+            await self.scanner.process_scan_frame(session_id, user_id, frame_data)
+    
+    async def _handle_update_settings(self, user_id: str, data: Dict[str, any]):
+        """Update a session's scan settings"""
+        session_id = data.get('session_id')
+        new_settings = data.get('settings', {})
+        
+        if session_id:
+            await self.scanner.update_scan_settings(session_id, user_id, new_settings)
+    
+    async def _handle_send_chat(self, user_id: str, data: Dict[str, any]):
+        """Relay a chat message to a session"""
+        session_id = data.get('session_id')
+        message = data.get('message')
+        
+        if session_id and message:
+            await self.scanner.broadcast_to_session(
+                session_id,
+                {
+                    'type': ScanEventType.CHAT_MESSAGE.value,
+                    'user_id': user_id,
+                    'message': message,
+                    'timestamp': time.time()
+                }
+            )
     
     async def start_server(self):
         """Start the collaborative scanning WebSocket server"""
+        # Compile the frame scoring kernel off the event loop before any
+        # client can submit a frame
+        await asyncio.get_running_loop().run_in_executor(None, _warm_up_kernels)
+        
+        # Large broadcasts are deflated once in _encode_event; permessage-deflate
+        # would compress the same bytes again for every connection. Frames may
+        # carry camera images, so allow 4 MiB but buffer at most 32 per client.
         self.websocket_server = await websockets.serve(
             self.handle_connection,
             self.host,
-            self.port
+            self.port,
+            compression=None,
+            max_size=_MAX_FRAME_SIZE,
+            max_queue=32
         )
         print(f"Collaborative scanning server started on {self.host}:{self.port}")
         
@@ -539,9 +844,12 @@ class CollaborativeScanServer:
         await self.websocket_server.wait_closed()
     
     def run_server(self):
-        """Run the server in a separate thread"""
+        """Run the server in a separate thread, on uvloop when it is installed"""
         def run():
-            asyncio.run(self.start_server())
+            if UVLOOP_AVAILABLE:
+                uvloop.run(self.start_server())
+            else:
+                asyncio.run(self.start_server())
         
         server_thread = Thread(target=run, daemon=True)
         server_thread.start()
@@ -552,6 +860,33 @@ class CollaborativeScanServer:
 collaborative_scanner = CollaborativeScanner()
 
 
+# Event loop that runs the synchronous helpers below, on its own daemon thread
+_loop = None
+_loop_lock = Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting it on first use"""
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = uvloop.new_event_loop() if UVLOOP_AVAILABLE else asyncio.new_event_loop()
+                Thread(target=loop.run_forever, daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def _run(coro):
+    """
+    Run a coroutine on the background loop and wait for its result
+    
+    One long-lived loop owns the scanner's locks and queues; creating a fresh
+    loop per call was slow and left those objects bound to closed loops.
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result()
+
+
 def initialize_collaborative_scanning():
     """Initialize the collaborative scanning system"""
     global collaborative_scanner
@@ -571,14 +906,7 @@ def create_collaborative_scan_session(creator_id: str, session_name: str = "Coll
     Returns:
         Session ID
     """
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    session_id = loop.run_until_complete(
-        collaborative_scanner.create_session(creator_id, session_name, settings)
-    )
-    loop.close()
-    return session_id
+    return _run(collaborative_scanner.create_session(creator_id, session_name, settings))
 
 
 def join_collaborative_scan_session(session_id: str, user_id: str, username: str = None) -> bool:
@@ -593,14 +921,7 @@ def join_collaborative_scan_session(session_id: str, user_id: str, username: str
     Returns:
         True if successful, False otherwise
     """
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    success = loop.run_until_complete(
-        collaborative_scanner.join_session(session_id, user_id, username)
-    )
-    loop.close()
-    return success
+    return _run(collaborative_scanner.join_session(session_id, user_id, username))
 
 
 def submit_scan_frame_to_session(session_id: str, user_id: str, frame_data: str):
@@ -612,13 +933,7 @@ def submit_scan_frame_to_session(session_id: str, user_id: str, frame_data: str)
         user_id: User ID submitting the frame
         frame_data: Base64 encoded image frame
     """
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(
-        collaborative_scanner.process_scan_frame(session_id, user_id, frame_data)
-    )
-    loop.close()
+    _run(collaborative_scanner.process_scan_frame(session_id, user_id, frame_data))
 
 
 def get_collaborative_session_state(session_id: str) -> Optional[Dict[str, any]]:
@@ -631,14 +946,7 @@ def get_collaborative_session_state(session_id: str) -> Optional[Dict[str, any]]
     Returns:
         Session state or None if session doesn't exist
     """
-    import asyncio
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    state = loop.run_until_complete(
-        collaborative_scanner.get_session_state(session_id)
-    )
-    loop.close()
-    return state
+    return _run(collaborative_scanner.get_session_state(session_id))
 
 
 # Example usage
@@ -3,6 +3,8 @@ Configuration for KD-Code System
 Defines default parameters and settings for the KD-Code generator and scanner.
 """
 
+from types import MappingProxyType
+
 # KD-Code Generation Parameters
 DEFAULT_SEGMENTS_PER_RING = 16
 DEFAULT_ANCHOR_RADIUS = 10
@@ -15,6 +17,13 @@ DEFAULT_SCAN_SEGMENTS_PER_RING = 16
 DEFAULT_MIN_ANCHOR_RADIUS = 5
 DEFAULT_MAX_ANCHOR_RADIUS = 100
 
+# Read-only view of the scanning defaults, keyed like decode_kd_code's arguments
+SCAN_DEFAULTS = MappingProxyType({
+    'segments_per_ring': DEFAULT_SCAN_SEGMENTS_PER_RING,
+    'min_anchor_radius': DEFAULT_MIN_ANCHOR_RADIUS,
+    'max_anchor_radius': DEFAULT_MAX_ANCHOR_RADIUS
+})
+
 # Image Processing Parameters
 MAX_IMAGE_SIZE = 2000  # Maximum allowed image dimension in pixels
 MAX_RINGS = 20  # Maximum number of rings allowed
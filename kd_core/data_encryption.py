@@ -3,9 +3,18 @@ Data Encryption Module for KD-Code System
 Provides encryption for sensitive data stored in KD-Codes
 """
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, InvalidToken
 import base64
+import functools
 import os
+import re
+
+
+# Shape of URL-safe base64 text: alphabet characters, then at most two pads
+_URLSAFE_B64_RE = re.compile(r'[A-Za-z0-9_-]+={0,2}')
+
+# Shortest string treated as ciphertext; real Fernet tokens are far longer
+_MIN_ENCRYPTED_LENGTH = 16
 
 
 class DataEncryption:
@@ -39,14 +48,8 @@ class DataEncryption:
         if not isinstance(data, str):
             raise TypeError("Data must be a string")
         
-        # Encode the string to bytes
-        data_bytes = data.encode('utf-8')
-        
-        # Encrypt the data
-        encrypted_data = self.cipher_suite.encrypt(data_bytes)
-        
-        # Return as base64 string for easy transmission/storage
-        return base64.urlsafe_b64encode(encrypted_data).decode('utf-8')
+        # Fernet tokens are already URL-safe base64, so they are returned as is
+        return self.cipher_suite.encrypt(data.encode('utf-8')).decode('ascii')
     
     def decrypt_data(self, encrypted_data):
         """
@@ -62,11 +65,13 @@ class DataEncryption:
             raise TypeError("Encrypted data must be a string")
         
         try:
-            # Decode from base64
-            encrypted_bytes = base64.urlsafe_b64decode(encrypted_data.encode('utf-8'))
-            
-            # Decrypt the data
-            decrypted_data = self.cipher_suite.decrypt(encrypted_bytes)
+            token = encrypted_data.encode('utf-8')
+            try:
+                decrypted_data = self.cipher_suite.decrypt(token)
+            except InvalidToken:
+                # Data encrypted before tokens were stored directly carries
+                # an extra layer of base64 around the Fernet token
+                decrypted_data = self.cipher_suite.decrypt(base64.urlsafe_b64decode(token))
             
             # Return as string
             return decrypted_data.decode('utf-8')
@@ -77,25 +82,37 @@ class DataEncryption:
         """
         Check if data appears to be encrypted
         
+        This is a structural check on the text only: it neither decodes the
+        data nor verifies it against a key, and allocates nothing on large input.
+        
         Args:
             data (str): Data to check
         
         Returns:
             bool: True if data appears to be encrypted
         """
-        try:
-            # Try to decode as base64
-            base64.urlsafe_b64decode(data.encode('utf-8'))
-            # If it's valid base64, it might be encrypted
-            return True
-        except Exception:
+        if not isinstance(data, str):
             return False
+        return (len(data) >= _MIN_ENCRYPTED_LENGTH and len(data) % 4 == 0
+                and _URLSAFE_B64_RE.fullmatch(data) is not None)
 
 
 # Global encryption instance
 encryption_handler = DataEncryption()
 
 
+@functools.lru_cache(maxsize=32)
+def _handler_for(key):
+    """
+    Return a shared handler for a custom key
+    
+    Building a Fernet instance per call was the main cost of encrypting
+    short texts with a custom key. Note that the most recently used keys
+    stay referenced in-process by this cache.
+    """
+    return DataEncryption(key)
+
+
 def encrypt_sensitive_text(text, custom_key=None):
     """
     Convenience function to encrypt sensitive text before encoding in KD-Code
@@ -107,11 +124,8 @@ def encrypt_sensitive_text(text, custom_key=None):
     Returns:
         str: Encrypted text
     """
-    if custom_key:
-        handler = DataEncryption(custom_key)
-        return handler.encrypt_data(text)
-    else:
-        return encryption_handler.encrypt_data(text)
+    handler = _handler_for(custom_key) if custom_key else encryption_handler
+    return handler.encrypt_data(text)
 
 
 def decrypt_sensitive_text(encrypted_text, custom_key=None):
@@ -125,11 +139,8 @@ def decrypt_sensitive_text(encrypted_text, custom_key=None):
     Returns:
         str: Decrypted text
     """
-    if custom_key:
-        handler = DataEncryption(custom_key)
-        return handler.decrypt_data(encrypted_text)
-    else:
-        return encryption_handler.decrypt_data(encrypted_text)
+    handler = _handler_for(custom_key) if custom_key else encryption_handler
+    return handler.decrypt_data(encrypted_text)
 
 
 # Example usage
@@ -21,6 +21,21 @@ def generate_kd_code(text, segments_per_ring=DEFAULT_SEGMENTS_PER_RING, anchor_r
     """
     Generate a KD-Code image from input text.
     
+    Takes the same arguments as generate_kd_code_bytes.
+    
+    Returns:
+        str: Base64 encoded PNG image of the KD-Code
+    """
+    image_bytes = generate_kd_code_bytes(text, segments_per_ring, anchor_radius, ring_width, scale_factor, max_chars,
+                                         compression_quality, foreground_color, background_color, theme)
+    return base64.b64encode(image_bytes).decode('utf-8')
+
+
+def generate_kd_code_bytes(text, segments_per_ring=DEFAULT_SEGMENTS_PER_RING, anchor_radius=DEFAULT_ANCHOR_RADIUS, ring_width=DEFAULT_RING_WIDTH, scale_factor=DEFAULT_SCALE_FACTOR, max_chars=DEFAULT_MAX_CHARS, compression_quality=95, 
+                           foreground_color='black', background_color='white', theme=None):
+    """
+    Generate a KD-Code image from input text as raw image bytes.
+    
     Args:
         text (str): Input text to encode (max 128 characters by default)
         segments_per_ring (int): Number of segments per ring (default 16, configurable to 32)
@@ -34,7 +49,7 @@ def generate_kd_code(text, segments_per_ring=DEFAULT_SEGMENTS_PER_RING, anchor_r
         theme (str): Predefined theme ('dark', 'light', 'colorful', etc.) - overrides individual colors
     
     Returns:
-        str: Base64 encoded PNG image of the KD-Code
+        bytes: Encoded image of the KD-Code (PNG at quality 100, JPEG below)
     
     Raises:
         ValueError: If input parameters are invalid
@@ -187,7 +202,7 @@ def generate_kd_code(text, segments_per_ring=DEFAULT_SEGMENTS_PER_RING, anchor_r
         center_y + distortion_radius_scaled
     ], outline=foreground_color, width=max(1, int(2*scale_factor)))
     
-    # Convert image to base64
+    # Encode the image
     buffer = BytesIO()
     
     # Use JPEG format for compression if quality is less than 100, otherwise use PNG
@@ -199,9 +214,7 @@ def generate_kd_code(text, segments_per_ring=DEFAULT_SEGMENTS_PER_RING, anchor_r
     else:
         img.save(buffer, format='PNG')
     
-    img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-    
-    return img_base64
+    return buffer.getvalue()
 
 
 def draw_annular_segment(draw, center_x, center_y, inner_radius, outer_radius, start_angle, end_angle, fill_color):
@@ -212,37 +225,19 @@ def draw_annular_segment(draw, center_x, center_y, inner_radius, outer_radius, s
     if inner_radius < 0 or outer_radius <= 0 or inner_radius >= outer_radius:
         return  # Invalid radii, skip drawing
     
-    # Create a path for the annular segment
-    from PIL import ImagePath
-    path = ImagePath.Path()
-    
-    # Calculate points along the outer arc
-    outer_points = []
-    inner_points = []
-    
     # Number of points to approximate the arc (more points = smoother curve)
     num_points = max(10, int(abs(end_angle - start_angle) * 0.5))  # At least 10 points
     
-    for i in range(num_points + 1):
-        t = i / num_points
-        angle = start_angle + t * (end_angle - start_angle)
-        x_outer = center_x + outer_radius * math.cos(math.radians(angle))
-        y_outer = center_y + outer_radius * math.sin(math.radians(angle))
-        outer_points.append((x_outer, y_outer))
-    
-    # Calculate points along the inner arc (in reverse order)
-    for i in range(num_points + 1):
-        t = i / num_points
-        angle = end_angle - t * (end_angle - start_angle)
-        x_inner = center_x + inner_radius * math.cos(math.radians(angle))
-        y_inner = center_y + inner_radius * math.sin(math.radians(angle))
-        inner_points.append((x_inner, y_inner))
-    
-    # Combine points to form the complete path
-    all_points = outer_points + inner_points
-    
-    # Draw the polygon
-    draw.polygon(all_points, fill=fill_color)
+    # Outer arc from start to end, then inner arc back from end to start,
+    # computed for all points at once
+    sweep = (np.arange(num_points + 1) / num_points) * (end_angle - start_angle)
+    angles = np.radians(np.concatenate((start_angle + sweep, end_angle - sweep)))
+    radii = np.repeat((outer_radius, inner_radius), num_points + 1)
+    xs = center_x + radii * np.cos(angles)
+    ys = center_y + radii * np.sin(angles)
+    
+    # Draw the polygon (flat x0, y0, x1, y1, ... coordinate list)
+    draw.polygon(np.column_stack((xs, ys)).ravel().tolist(), fill=fill_color)
 
 
 # Example usage
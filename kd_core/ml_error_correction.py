@@ -172,6 +172,41 @@ class KDCErrorCorrection:
         # Return the predicted class
         return int(prediction)
     
+    def correct_pixel_values(self, pixel_intensities: np.ndarray, context_info: dict) -> np.ndarray:
+        """
+        Correct many pixel values with a single model call
+        
+        Args:
+            pixel_intensities: 1-D array of raw pixel intensities
+            context_info: Same keys as for correct_pixel_value, each holding
+                either one value or an array aligned with pixel_intensities
+        
+        Returns:
+            Array of corrected binary values (0 or 1)
+        """
+        intensities = np.asarray(pixel_intensities, dtype=np.float64)
+        if not self.is_trained:
+            # If not trained, use simple threshold
+            return (intensities >= 128).astype(int)
+        if intensities.size == 0:
+            return np.zeros(0, dtype=int)
+        
+        # Same feature layout as correct_pixel_value, one row per pixel
+        original = context_info.get('original_intensity', intensities)
+        features = np.empty((intensities.size, 10))
+        features[:, 0] = original
+        features[:, 1] = intensities
+        features[:, 2] = context_info.get('noise_level', 10.0)
+        features[:, 3] = context_info.get('position_variance', 0.0)
+        features[:, 4] = context_info.get('context_influence', 0.0)
+        features[:, 5] = np.abs(original - intensities)
+        features[:, 6] = context_info.get('local_avg', 128)
+        features[:, 7] = context_info.get('gradient', 0.0)
+        features[:, 8] = context_info.get('surrounding_avg', 128)
+        features[:, 9] = context_info.get('confidence', 0.5)
+        
+        return self.model.predict(features).astype(int)
+    
     def correct_bit_sequence(self, bit_sequence: List[int], confidence_scores: List[float] = None) -> List[int]:
         """
         Apply ML-based error correction to a sequence of bits
@@ -323,6 +358,25 @@ def correct_pixel_value(pixel_intensity: float, context_info: dict) -> int:
     return error_corrector.correct_pixel_value(pixel_intensity, context_info)
 
 
+def correct_pixel_values(pixel_intensities: np.ndarray, context_info: dict) -> np.ndarray:
+    """
+    Apply ML-based error correction to many pixel values at once
+    
+    Args:
+        pixel_intensities: 1-D array of raw pixel intensities
+        context_info: Dictionary of per-pixel arrays or shared values
+    
+    Returns:
+        Array of corrected binary values (0 or 1)
+    """
+    global error_corrector
+    
+    if not error_corrector.is_trained:
+        initialize_error_correction()
+    
+    return error_corrector.correct_pixel_values(pixel_intensities, context_info)
+
+
 # Example usage and testing
 if __name__ == "__main__":
     # Initialize the error correction system
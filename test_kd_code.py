@@ -11,6 +11,10 @@ import numpy as np
 import cv2
 import tempfile
 import os
+import asyncio
+import random
+from collections import deque
+from unittest import mock
 
 # Import the modules to test
 from kd_core.encoder import generate_kd_code, draw_annular_segment
@@ -23,6 +27,11 @@ from kd_core.config import (
 from kd_core.qr_compatibility import generate_qr_code, is_qr_compatible
 from kd_core.data_encryption import encrypt_sensitive_text, decrypt_sensitive_text, DataEncryption
 from kd_core.backup_recovery import backup_system
+from kd_core.bulk_operations import bulk_processor
+from kd_core.blockchain_verification import KDCodeBlockchain, verify_merkle_proof
+from kd_core.collaborative_editor import CollaborativeEditor, Operation, OperationType, TextBuffer, transform
+from kd_core import collaborative_scanning
+from kd_core.collaborative_scanning import CollaborativeScanner
 
 
 class TestEncoder(unittest.TestCase):
@@ -273,6 +282,21 @@ class TestDataEncryption(unittest.TestCase):
         # Test with invalid encrypted data
         with self.assertRaises(ValueError):
             handler.decrypt_data("invalid_base64!")
+    
+    def test_legacy_double_base64_tokens(self):
+        """Test that ciphertext stored with the old extra base64 layer still decrypts"""
+        handler = DataEncryption()
+        original = "Stored before the token format change"
+        legacy = base64.urlsafe_b64encode(handler.cipher_suite.encrypt(original.encode('utf-8'))).decode('utf-8')
+        
+        self.assertTrue(handler.is_encrypted(legacy))
+        self.assertEqual(handler.decrypt_data(legacy), original)
+        
+        # New tokens are plain Fernet tokens and are recognized as well
+        current = handler.encrypt_data(original)
+        self.assertNotEqual(current, legacy)
+        self.assertTrue(handler.is_encrypted(current))
+        self.assertEqual(handler.decrypt_data(current), original)
 
 
 class TestBackupRecovery(unittest.TestCase):
@@ -312,6 +336,241 @@ class TestBackupRecovery(unittest.TestCase):
             self.assertTrue(os.path.exists(backup_path))
 
 
+class TestTextBuffer(unittest.TestCase):
+    """Test cases for the chunked document buffer"""
+    
+    def test_edits_match_string_splicing(self):
+        """Test random inserts and deletes across chunk boundaries"""
+        rng = random.Random(42)
+        size = TextBuffer.CHUNK_SIZE
+        expected = "".join(rng.choice("abcdef") for _ in range(3 * size + 17))
+        buffer = TextBuffer(expected)
+        
+        for _ in range(500):
+            position = rng.randint(0, len(expected))
+            if rng.random() < 0.5:
+                # Sizes up to three chunks force splits and multi-chunk spans
+                text = "x" * rng.randint(1, 3 * size)
+                buffer.insert(position, text)
+                expected = expected[:position] + text + expected[position:]
+            else:
+                count = rng.randint(0, 2 * size)
+                buffer.delete(position, count)
+                expected = expected[:position] + expected[position + count:]
+            self.assertEqual(len(buffer), len(expected))
+        
+        self.assertEqual(buffer.text(), expected)
+    
+    def test_delete_whole_chunks(self):
+        """Test deleting ranges that end exactly on chunk boundaries"""
+        size = TextBuffer.CHUNK_SIZE
+        text = "a" * size + "b" * size + "c" * size
+        buffer = TextBuffer(text)
+        buffer.delete(size, size)
+        self.assertEqual(buffer.text(), "a" * size + "c" * size)
+        buffer.delete(0, 2 * size)
+        self.assertEqual(buffer.text(), "")
+        buffer.insert(5, "new")
+        self.assertEqual(buffer.text(), "new")
+
+
+class TestCollaborativeEditor(unittest.TestCase):
+    """Test cases for applying operations to collaborative documents"""
+    
+    def test_stale_base_revision_is_rebased(self):
+        """Test that an operation made against an older revision is transformed"""
+        async def scenario():
+            editor = CollaborativeEditor()
+            doc_id = await editor.create_document("Doc", "alice", "hello world")
+            
+            # Both edits are made against revision 0
+            first = Operation("op1", "alice", OperationType.INSERT, 0, ">> ", base_revision=0)
+            second = Operation("op2", "bob", OperationType.DELETE, 6, "world", base_revision=0)
+            self.assertTrue(await editor.apply_operation(doc_id, first))
+            self.assertTrue(await editor.apply_operation(doc_id, second))
+            
+            doc = editor.documents[doc_id]
+            self.assertEqual(doc.content, ">> hello ")
+            self.assertEqual(doc.revision, 2)
+            self.assertEqual(doc.operations_log[-1].position, 9)
+        
+        asyncio.run(scenario())
+    
+    def test_evicted_base_revision_is_rejected(self):
+        """Test that an operation older than the retained log is refused"""
+        async def scenario():
+            editor = CollaborativeEditor()
+            doc_id = await editor.create_document("Doc", "alice", "abc")
+            doc = editor.documents[doc_id]
+            doc.operations_log = deque(maxlen=2)
+            
+            for i in range(3):
+                op = Operation(f"op{i}", "alice", OperationType.INSERT, 0, "x", base_revision=i)
+                self.assertTrue(await editor.apply_operation(doc_id, op))
+            
+            # Revision 0 has rolled out of the log; revision 1 is still covered
+            stale = Operation("stale", "bob", OperationType.INSERT, 3, "!", base_revision=0)
+            self.assertFalse(await editor.apply_operation(doc_id, stale))
+            self.assertEqual(doc.content, "xxxabc")
+            
+            recent = Operation("recent", "bob", OperationType.INSERT, 4, "!", base_revision=1)
+            self.assertTrue(await editor.apply_operation(doc_id, recent))
+            self.assertEqual(doc.content, "xxxabc!")
+        
+        asyncio.run(scenario())
+
+
+class TestOperationalTransform(unittest.TestCase):
+    """Test cases for convergence of concurrent collaborative edits"""
+    
+    BASE = "abcd"
+    
+    @staticmethod
+    def _apply(text, op):
+        """Apply an INSERT or DELETE to a plain string"""
+        if op.operation_type == OperationType.INSERT:
+            return text[:op.position] + op.text + text[op.position:]
+        return text[:op.position] + text[op.position + len(op.text):]
+    
+    def _inserts(self, user_id):
+        return [Operation(f"ins-{user_id}-{pos}-{text}", user_id, OperationType.INSERT, pos, text)
+                for pos in range(len(self.BASE) + 1) for text in ("X", "YY")]
+    
+    def _deletes(self, user_id):
+        return [Operation(f"del-{user_id}-{start}-{end}", user_id, OperationType.DELETE, start, self.BASE[start:end])
+                for start in range(len(self.BASE)) for end in range(start + 1, len(self.BASE) + 1)]
+    
+    def _assert_converges(self, first_ops, second_ops):
+        """Both application orders of every pair must give the same text"""
+        for a in first_ops:
+            for b in second_ops:
+                with self.subTest(a=a, b=b):
+                    a_then_b = self._apply(self._apply(self.BASE, a), transform(b, a))
+                    b_then_a = self._apply(self._apply(self.BASE, b), transform(a, b))
+                    self.assertEqual(a_then_b, b_then_a)
+    
+    def test_insert_insert_converges(self):
+        """Test concurrent inserts, including ties at the same position"""
+        self._assert_converges(self._inserts("alice"), self._inserts("bob"))
+    
+    def test_insert_insert_tie_break(self):
+        """Test that tied inserts are ordered by user ID either way round"""
+        a = Operation("op1", "alice", OperationType.INSERT, 2, "A")
+        b = Operation("op2", "bob", OperationType.INSERT, 2, "B")
+        self.assertEqual(self._apply(self._apply(self.BASE, a), transform(b, a)), "abABcd")
+        self.assertEqual(self._apply(self._apply(self.BASE, b), transform(a, b)), "abABcd")
+    
+    def test_insert_delete_converges(self):
+        """Test an insert concurrent with a delete, in both roles"""
+        self._assert_converges(self._inserts("alice"), self._deletes("bob"))
+        self._assert_converges(self._deletes("alice"), self._inserts("bob"))
+    
+    def test_insert_inside_deleted_range(self):
+        """Test that text inserted inside a concurrently deleted range is removed"""
+        a = Operation("op1", "alice", OperationType.INSERT, 1, "YY")
+        b = Operation("op2", "bob", OperationType.DELETE, 0, "fd")
+        self.assertEqual(self._apply(self._apply("fd", a), transform(b, a)), "")
+        self.assertEqual(self._apply(self._apply("fd", b), transform(a, b)), "")
+    
+    def test_delete_delete_converges(self):
+        """Test overlapping and disjoint concurrent deletes"""
+        self._assert_converges(self._deletes("alice"), self._deletes("bob"))
+
+
+class TestBulkOperations(unittest.TestCase):
+    """Test cases for bulk KD-Code processing"""
+    
+    def test_bulk_decoding_mixed_batch(self):
+        """Test that duplicates are shared and invalid items fail individually"""
+        image = generate_kd_code("BULK")
+        results = bulk_processor.process_bulk_decoding([image, image, "invalid_base64!", None])
+        
+        self.assertEqual(len(results), 4)
+        self.assertEqual([result['index'] for result in results], [0, 1, 2, 3])
+        self.assertTrue(results[1].get('cached'))
+        self.assertEqual(results[1]['status'], results[0]['status'])
+        self.assertEqual(results[2]['status'], 'error')
+        self.assertEqual(results[3]['status'], 'error')
+
+
+class TestBlockchainVerification(unittest.TestCase):
+    """Test cases for blockchain Merkle inclusion proofs"""
+    
+    def _mined_chain(self, leaf_count):
+        """Mine one block holding leaf_count KD-Code hashes"""
+        chain = KDCodeBlockchain(difficulty=1)
+        hashes = [f"kd-{leaf_count}-{i}" for i in range(leaf_count)]
+        for kd_code_hash in hashes:
+            chain.add_verification_request(kd_code_hash, {'leaf': kd_code_hash})
+        chain.mine_pending_verifications("test_miner")
+        return chain, hashes
+    
+    def test_merkle_proofs_for_every_leaf(self):
+        """Test proofs for every leaf, including odd-sized tree levels"""
+        for leaf_count in (1, 2, 3, 5, 7):
+            chain, hashes = self._mined_chain(leaf_count)
+            for kd_code_hash in hashes:
+                with self.subTest(leaves=leaf_count, leaf=kd_code_hash):
+                    proof = chain.get_merkle_proof(kd_code_hash)
+                    self.assertEqual(proof['block_index'], 1)
+                    self.assertEqual(proof['merkle_root'], chain.chain[1].merkle_root)
+                    self.assertTrue(verify_merkle_proof(kd_code_hash, proof))
+    
+    def test_merkle_proof_rejects_tampering(self):
+        """Test that altered proofs or hashes do not verify"""
+        chain, hashes = self._mined_chain(5)
+        proof = chain.get_merkle_proof(hashes[2])
+        
+        self.assertFalse(verify_merkle_proof("not-in-the-block", proof))
+        self.assertFalse(verify_merkle_proof(hashes[3], proof))
+        
+        tampered = dict(proof, path=[dict(step) for step in proof['path']])
+        sibling = bytearray(bytes.fromhex(tampered['path'][0]['hash']))
+        sibling[0] ^= 1
+        tampered['path'][0]['hash'] = sibling.hex()
+        self.assertFalse(verify_merkle_proof(hashes[2], tampered))
+        
+        self.assertFalse(verify_merkle_proof(hashes[2], dict(proof, merkle_root="00" * 32)))
+    
+    def test_merkle_proof_unknown_hash(self):
+        """Test that no proof is built for a KD-Code that was never mined"""
+        chain, _ = self._mined_chain(3)
+        self.assertIsNone(chain.get_merkle_proof("missing"))
+
+
+class TestCollaborativeScanner(unittest.TestCase):
+    """Test cases for delivering events to scanning session participants"""
+    
+    def test_stalled_send_closes_connection(self):
+        """Test that a send timing out drops the user and closes their socket"""
+        class StalledConnection:
+            def __init__(self):
+                self.close_code = None
+            
+            async def send(self, message, text=None):
+                await asyncio.Event().wait()
+            
+            async def close(self, code=1000, reason=''):
+                self.close_code = code
+        
+        async def scenario():
+            scanner = CollaborativeScanner()
+            websocket = StalledConnection()
+            session_id = await scanner.create_session("alice")
+            scanner.register_connection("alice", websocket)
+            
+            await scanner.send_to_user("alice", {'type': 'ping'})
+            await asyncio.wait_for(scanner.relays["alice"], 1)
+            await asyncio.sleep(0)
+            
+            self.assertNotIn("alice", scanner.outboxes)
+            self.assertNotIn("alice", scanner.session_participants[session_id])
+            self.assertEqual(websocket.close_code, 1011)
+        
+        with mock.patch.object(collaborative_scanning, '_SEND_TIMEOUT', 0.05):
+            asyncio.run(scenario())
+
+
 class TestIntegration(unittest.TestCase):
     """Integration tests for encoder-decoder pipeline"""
     